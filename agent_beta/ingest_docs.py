@@ -5,12 +5,138 @@ Ingest AI/ML documents into Agent Beta's vector store.
 import os
 import sys
 import asyncio
+import mmap
+from collections import Counter
 
 # Add paths
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
 from knowledge.vector_provider import VectorProvider
 
+# Pipeline tuning: workers per stage, queue size and batch sizes
+N_LOAD_WORKERS = 2
+N_CHUNK_WORKERS = 4
+N_EMBED_WORKERS = 4
+N_UPSERT_WORKERS = 1
+QUEUE_SIZE = 32
+
+# Chunk window in bytes (None = use SystemSettings)
+CHUNK_SIZE = None
+CHUNK_OVERLAP = None
+
+# Number of chunks sent to the embedding model per call
+EMBEDDING_BATCH_SIZE = 128
+
+# Number of chunks written to Chroma per add() call
+UPSERT_BATCH_SIZE = 1024
+
+
+def _map_file(path: str):
+    """Memory-map a document read-only. Returns None for empty files."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        # The mapping stays valid after the file object is closed
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+async def _drain(queue: asyncio.Queue, first, max_items: int) -> list:
+    """Take `first` plus whatever is already queued, up to max_items."""
+    items = [first]
+    while len(items) < max_items:
+        try:
+            item = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        if item is None:
+            # Put the sentinel back so the loop in the caller sees it
+            queue.put_nowait(None)
+            break
+        items.append(item)
+    return items
+
+
+async def run_pipeline(
+    vector_provider: VectorProvider,
+    doc_paths: list,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP
+) -> tuple:
+    """
+    Ingest documents through a staged pipeline: Load -> Chunk -> Embed -> Upsert.
+    
+    Stages are connected by bounded queues so disk reads, chunking, embedding
+    and Chroma writes overlap instead of running one after the other.
+    Returns ({path: size in bytes}, {path: chunks upserted}); documents that
+    produced no chunks are missing from the second dict.
+    """
+    path_q = asyncio.Queue()
+    text_q = asyncio.Queue(maxsize=QUEUE_SIZE)
+    chunk_q = asyncio.Queue(maxsize=QUEUE_SIZE)
+    embed_q = asyncio.Queue(maxsize=QUEUE_SIZE)
+    sizes = {}
+    upserted = Counter()
+    
+    for path in doc_paths:
+        path_q.put_nowait(path)
+    for _ in range(N_LOAD_WORKERS):
+        path_q.put_nowait(None)
+    
+    async def load_worker():
+        while (path := await path_q.get()) is not None:
+            mapped = await asyncio.to_thread(_map_file, path)
+            sizes[path] = len(mapped) if mapped is not None else 0
+            if mapped is not None:
+                await text_q.put((path, mapped))
+    
+    async def chunk_worker():
+        while (item := await text_q.get()) is not None:
+            path, mapped = item
+            try:
+                for chunk in vector_provider._chunk_bytes(mapped, chunk_size, chunk_overlap):
+                    await chunk_q.put((path, chunk))
+            finally:
+                mapped.close()
+    
+    async def embed_worker():
+        while (item := await chunk_q.get()) is not None:
+            batch = await _drain(chunk_q, item, EMBEDDING_BATCH_SIZE)
+            paths, chunks = zip(*batch)
+            embeddings = await asyncio.to_thread(vector_provider.embed_chunks, list(chunks))
+            await embed_q.put((paths, chunks, embeddings))
+    
+    async def upsert(paths, chunks, embeddings):
+        await asyncio.to_thread(vector_provider.add_chunks, chunks, embeddings)
+        upserted.update(paths)
+    
+    async def upsert_worker():
+        paths, chunks, embeddings = [], [], []
+        while (item := await embed_q.get()) is not None:
+            paths.extend(item[0])
+            chunks.extend(item[1])
+            embeddings.extend(item[2])
+            if len(chunks) >= UPSERT_BATCH_SIZE:
+                await upsert(paths, chunks, embeddings)
+                paths, chunks, embeddings = [], [], []
+        if chunks:
+            await upsert(paths, chunks, embeddings)
+    
+    async def stage(worker, count, next_q=None, next_count=0):
+        # Run the workers of one stage, then send one sentinel per downstream worker
+        await asyncio.gather(*[worker() for _ in range(count)])
+        for _ in range(next_count):
+            await next_q.put(None)
+    
+    await asyncio.gather(
+        stage(load_worker, N_LOAD_WORKERS, text_q, N_CHUNK_WORKERS),
+        stage(chunk_worker, N_CHUNK_WORKERS, chunk_q, N_EMBED_WORKERS),
+        stage(embed_worker, N_EMBED_WORKERS, embed_q, N_UPSERT_WORKERS),
+        stage(upsert_worker, N_UPSERT_WORKERS),
+    )
+    return sizes, upserted
+
 
 async def ingest_documents():
     """Ingest all markdown documents from aiml_docs folder."""
@@ -26,29 +152,35 @@ async def ingest_documents():
         collection_name="agent_beta_docs",
         persist_directory=chroma_dir
     )
+    await vector_provider.warmup()
     
     # Find all markdown files
-    doc_files = [f for f in os.listdir(docs_dir) if f.endswith('.md')]
+    with os.scandir(docs_dir) as it:
+        doc_entries = [
+            e for e in it
+            if e.is_file() and e.name.endswith('.md') and not e.name.startswith('.')
+        ]
     
     print(f"\n{'='*60}")
     print(f"  Agent Beta Document Ingestion")
     print(f"{'='*60}\n")
     
-    for doc_file in doc_files:
-        doc_path = os.path.join(docs_dir, doc_file)
-        
-        with open(doc_path, 'r') as f:
-            content = f.read()
-        
-        print(f"📄 Ingesting: {doc_file}")
-        print(f"   Size: {len(content)} characters")
-        
-        success = await vector_provider.ingest(content)
+    
+    try:
+        sizes, upserted = await run_pipeline(vector_provider, [e.path for e in doc_entries])
         
-        if success:
-            print(f"   ✅ Successfully ingested")
-        else:
-            print(f"   ❌ Failed to ingest")
+        # Build the per-file summary and write it to stdout once
+        name_width = max((len(e.name) for e in doc_entries), default=0)
+        summary = [f"📄 {'File':<{name_width}}  {'Bytes':>10}  {'Chunks':>7}"]
+        for e in doc_entries:
+            summary.append(f"   {e.name:<{name_width}}  {sizes.get(e.path, 0):>10}  {upserted[e.path]:>7}")
+        skipped = [e.name for e in doc_entries if not upserted[e.path]]
+        summary.append(f"\n✅ Successfully ingested {len(doc_entries) - len(skipped)} documents")
+        if skipped:
+            summary.append(f"⚠️  Skipped {len(skipped)} empty documents: {', '.join(skipped)}")
+        print("\n".join(summary))
+    except Exception as e:
+        print(f"\n❌ Failed to ingest documents: {e}")
     
     # Show stats
     stats = await vector_provider.get_stats()
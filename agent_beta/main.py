@@ -5,14 +5,24 @@ A second Gemini-based agent for testing bidirectional knowledge exchange.
 Runs on port 8001 with a different domain (AI/ML Research).
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import request_validation_exception_handler
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, List, Dict, Any, Union
 import os
 import sys
+import asyncio
 import time
-from datetime import datetime
+import uuid
+import hashlib
+import httpx
+import numpy as np
+import orjson
+from contextlib import asynccontextmanager
+from collections import OrderedDict
 
 # Add parent directory to path for shared modules
 BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..', 'backend')
@@ -29,7 +39,7 @@ from core.assessment import SelfAssessmentEngine
 # Import providers
 from knowledge.vector_provider import VectorProvider
 from knowledge.graph_provider import GraphProvider
-from core.gemini_client import GeminiClient
+from core.gemini_client import GeminiClient, ANSWER_FAILED
 
 
 # =============================================================================
@@ -40,7 +50,60 @@ AGENT_ID = "agent-beta-aiml"
 AGENT_NAME = "AI/ML Research Agent"
 AGENT_DOMAIN = "artificial-intelligence"
 PORT = 8001
-PEER_AGENT_URL = "http://localhost:8000"  # Agent Alpha (DKMES)
+PEER_AGENTS = [
+    "http://localhost:8000",  # Agent Alpha (DKMES)
+]
+
+
+# =============================================================================
+# Providers
+# =============================================================================
+
+# Use separate data directories for Agent Beta
+BETA_DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+BETA_CHROMA_DIR = os.path.join(BETA_DATA_DIR, "chroma_beta")
+BETA_KEP_DB = os.path.join(BETA_DATA_DIR, "kep_beta.db")
+BETA_FEEDBACK_DB = os.path.join(BETA_DATA_DIR, "feedback_beta.db")
+BETA_ASSESSMENT_DB = os.path.join(BETA_DATA_DIR, "assessment_beta.db")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create providers once per process and register with the peer agent."""
+    os.makedirs(BETA_CHROMA_DIR, exist_ok=True)
+    
+    app.state.vector_provider = VectorProvider(
+        collection_name="agent_beta_docs",
+        persist_directory=BETA_CHROMA_DIR
+    )
+    app.state.graph_provider = GraphProvider()  # Shared graph for now
+    app.state.gemini_client = GeminiClient()
+    app.state.gemini_client.embedding_fn = app.state.vector_provider.embedding_fn
+    
+    # KEP Handler with Beta-specific database
+    app.state.kep_handler = KEPHandler(
+        vector_provider=app.state.vector_provider,
+        graph_provider=app.state.graph_provider,
+        gemini_client=app.state.gemini_client,
+        db_path=BETA_KEP_DB
+    )
+    app.state.assessment_engine = SelfAssessmentEngine(
+        vector_provider=app.state.vector_provider,
+        graph_provider=app.state.graph_provider,
+        kep_handler=app.state.kep_handler,
+        db_path=BETA_ASSESSMENT_DB
+    )
+    
+    # Shared HTTP client so outbound calls reuse pooled connections
+    app.state.http = httpx.AsyncClient(
+        timeout=5.0,
+        limits=httpx.Limits(max_keepalive_connections=32)
+    )
+    
+    await startup_event()
+    yield
+    await app.state.gemini_client.flush_cache()
+    await app.state.http.aclose()
 
 
 # =============================================================================
@@ -50,7 +113,9 @@ PEER_AGENT_URL = "http://localhost:8000"  # Agent Alpha (DKMES)
 app = FastAPI(
     title=f"Agent Beta - {AGENT_NAME}",
     description="AI/ML Research Agent for bidirectional knowledge exchange",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -63,37 +128,6 @@ app.add_middleware(
 )
 
 
-# =============================================================================
-# Initialize Providers
-# =============================================================================
-
-# Use separate data directories for Agent Beta
-BETA_DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
-BETA_CHROMA_DIR = os.path.join(BETA_DATA_DIR, "chroma_beta")
-BETA_KEP_DB = os.path.join(BETA_DATA_DIR, "kep_beta.db")
-BETA_FEEDBACK_DB = os.path.join(BETA_DATA_DIR, "feedback_beta.db")
-BETA_ASSESSMENT_DB = os.path.join(BETA_DATA_DIR, "assessment_beta.db")
-
-# Create directories
-os.makedirs(BETA_CHROMA_DIR, exist_ok=True)
-
-# Initialize providers
-vector_provider = VectorProvider(
-    collection_name="agent_beta_docs",
-    persist_directory=BETA_CHROMA_DIR
-)
-graph_provider = GraphProvider()  # Shared graph for now
-gemini_client = GeminiClient()
-
-# KEP Handler with Beta-specific database
-kep_handler = KEPHandler(
-    vector_provider=vector_provider,
-    graph_provider=graph_provider,
-    gemini_client=gemini_client,
-    db_path=BETA_KEP_DB
-)
-
-
 # =============================================================================
 # Models
 # =============================================================================
@@ -117,21 +151,71 @@ class ChatResponse(BaseModel):
     confidence: float = 0.0
 
 
+class JsonRpcRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    jsonrpc: str = "2.0"
+    id: Union[str, int, None] = None
+    method: str = ""
+    params: Dict[str, Any] = {}
+
+
+# =============================================================================
+# Answer Cache
+# =============================================================================
+
+# Repeated queries skip retrieval and generation for a few minutes
+ANSWER_CACHE_SIZE = 4096
+ANSWER_CACHE_TTL = 300  # seconds
+
+_answer_cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+
+
+def _answer_cache_key(query: str, top_k: int) -> bytes:
+    return hashlib.blake2b(f"{top_k}:{query}".encode(), digest_size=16).digest()
+
+
+def _answer_cache_get(key: bytes) -> Optional[Any]:
+    entry = _answer_cache.get(key)
+    if entry is None:
+        return None
+    stored_at, value = entry
+    if time.time() - stored_at > ANSWER_CACHE_TTL:
+        del _answer_cache[key]
+        return None
+    _answer_cache.move_to_end(key)
+    return value
+
+
+def _answer_cache_put(key: bytes, value: Any):
+    _answer_cache[key] = (time.time(), value)
+    _answer_cache.move_to_end(key)
+    if len(_answer_cache) > ANSWER_CACHE_SIZE:
+        _answer_cache.popitem(last=False)
+
+
 # =============================================================================
 # Endpoints
 # =============================================================================
 
-@app.get("/")
-async def root():
-    """Root endpoint with agent info."""
-    return {
+# Static info never changes, so serialize it once
+ROOT_RESPONSE = Response(
+    content=orjson.dumps({
         "agent_id": AGENT_ID,
         "name": AGENT_NAME,
         "domain": AGENT_DOMAIN,
         "port": PORT,
-        "peer_agent": PEER_AGENT_URL,
+        "peer_agents": PEER_AGENTS,
         "status": "running"
-    }
+    }),
+    media_type="application/json"
+)
+
+
+@app.get("/")
+async def root():
+    """Root endpoint with agent info."""
+    return ROOT_RESPONSE
 
 
 # =============================================================================
@@ -159,62 +243,78 @@ BETA_AGENT_CARD = {
 }
 
 
+BETA_AGENT_CARD_RESPONSE = Response(
+    content=orjson.dumps(BETA_AGENT_CARD),
+    media_type="application/json"
+)
+
+
 @app.get("/.well-known/agent.json")
 def get_agent_card():
     """Returns the A2A Agent Card for discovery."""
-    return BETA_AGENT_CARD
+    return BETA_AGENT_CARD_RESPONSE
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """Answer malformed A2A calls with a JSON-RPC error instead of a 422."""
+    if request.url.path == "/a2a":
+        # Malformed JSON is a parse error; well-formed JSON of the wrong shape is an invalid request
+        if any(err.get("type") == "json_invalid" for err in exc.errors()):
+            error = {"code": -32700, "message": "Parse error"}
+        else:
+            error = {"code": -32600, "message": "Invalid Request"}
+        return ORJSONResponse({"jsonrpc": "2.0", "id": None, "error": error})
+    return await request_validation_exception_handler(request, exc)
 
 
 @app.post("/a2a")
-async def handle_a2a_request(request: dict):
+async def handle_a2a_request(request: JsonRpcRequest):
     """
     A2A JSON-RPC endpoint.
     
     Supports methods:
     - message/send: Send a message and get response
     """
-    import uuid as uuid_lib
-    import time as time_lib
-    
-    # Parse JSON-RPC request
-    try:
-        jsonrpc = request.get("jsonrpc", "2.0")
-        req_id = request.get("id", str(uuid_lib.uuid4()))
-        method = request.get("method", "")
-        params = request.get("params", {})
-    except Exception:
-        return {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}
+    req_id = request.id if "id" in request.model_fields_set else str(uuid.uuid4())
+    method = request.method
+    params = request.params
     
     if method == "message/send":
         try:
             # Extract query from message parts
             message = params.get("message", {})
             parts = message.get("parts", [])
-            query = " ".join([p.get("text", "") for p in parts if p.get("text")])
+            query = " ".join(t for p in parts if (t := p.get("text")))
             
             if not query:
                 return {"jsonrpc": "2.0", "id": req_id, "error": {"code": -32602, "message": "No text in message"}}
             
             # Process with local RAG
-            results = await vector_provider.search(query, top_k=3)
-            context = "\n\n".join([doc.get("content", doc.get("text", "")) for doc in results])
-            
-            answer = await gemini_client.generate_answer(query, context)
+            cache_key = _answer_cache_key(query, 3)
+            answer = _answer_cache_get(cache_key)
+            if answer is None:
+                results = await app.state.vector_provider.search(query, top_k=3)
+                context = "\n\n".join([doc.get("content", doc.get("text", "")) for doc in results])
+                
+                answer = await app.state.gemini_client.generate_answer(query, context)
+                if answer != ANSWER_FAILED:
+                    _answer_cache_put(cache_key, answer)
             
             # Build A2A Task response
-            task_id = str(uuid_lib.uuid4())
+            task_id = str(uuid.uuid4())
             task = {
                 "id": task_id,
                 "contextId": params.get("contextId"),
                 "status": {
                     "state": "TASK_STATE_COMPLETED",
                     "message": {
-                        "messageId": str(uuid_lib.uuid4()),
+                        "messageId": str(uuid.uuid4()),
                         "taskId": task_id,
                         "role": "ROLE_AGENT",
                         "parts": [{"text": answer}]
                     },
-                    "timestamp": time_lib.time()
+                    "timestamp": time.time()
                 },
                 "artifacts": [{"parts": [{"text": answer}]}],
                 "history": []
@@ -224,11 +324,11 @@ async def handle_a2a_request(request: dict):
             
         except Exception as e:
             task = {
-                "id": str(uuid_lib.uuid4()),
+                "id": str(uuid.uuid4()),
                 "status": {
                     "state": "TASK_STATE_FAILED",
                     "message": {"role": "ROLE_AGENT", "parts": [{"text": str(e)}]},
-                    "timestamp": time_lib.time()
+                    "timestamp": time.time()
                 }
             }
             return {"jsonrpc": "2.0", "id": req_id, "result": task}
@@ -245,46 +345,60 @@ async def health_check():
         agent_id=AGENT_ID,
         agent_name=AGENT_NAME,
         domain=AGENT_DOMAIN,
-        timestamp=datetime.now().isoformat()
+        timestamp=time.strftime("%Y-%m-%dT%H:%M:%S")
     )
 
 
 @app.post("/api/v1/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Simple chat endpoint using local knowledge."""
+    cache_key = _answer_cache_key(request.message, 5)
+    cached = _answer_cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        # Search local vector store
-        results = await vector_provider.search(request.message, top_k=5)
+        # Search local vector store while the Gemini connection is warmed up
+        results, _ = await asyncio.gather(
+            app.state.vector_provider.search(request.message, top_k=5),
+            app.state.gemini_client.prewarm()
+        )
         
         # Build context
         context_parts = []
         sources = []
+        scores = np.empty(len(results), dtype=np.float32)
         for i, doc in enumerate(results):
             content = doc.get("content", "")
+            score = doc.get("score", 0.0)
+            scores[i] = score
             context_parts.append(content)
             sources.append({
                 "id": f"src_{i}",
-                "excerpt": content[:200] + "..." if len(content) > 200 else content,
-                "score": doc.get("score", 0.0)
+                "excerpt": content if len(content) <= 200 else f"{content[:200]}...",
+                "score": score
             })
         
         context = "\n\n".join(context_parts)
         
         # Generate answer
-        answer = await gemini_client.generate_answer(
+        answer = await app.state.gemini_client.generate_answer(
             query=request.message,
             context=context
         )
         
         # Calculate confidence
-        avg_score = sum(s["score"] for s in sources) / len(sources) if sources else 0.0
-        confidence = 1.0 - min(avg_score, 1.0)  # Lower distance = higher confidence
+        avg_score = float(scores.mean()) if len(scores) else 0.0
+        confidence = max(0.0, 1.0 - avg_score)  # ip distance = 1 - cosine similarity
         
-        return ChatResponse(
+        response = ChatResponse(
             answer=answer,
             sources=sources,
             confidence=confidence
         )
+        if answer != ANSWER_FAILED:
+            _answer_cache_put(cache_key, response)
+        return response
     except Exception as e:
         return ChatResponse(
             answer=f"Error: {str(e)}",
@@ -293,6 +407,23 @@ async def chat(request: ChatRequest):
         )
 
 
+@app.post("/api/v1/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Chat endpoint that streams the answer as server-sent events."""
+    results = await app.state.vector_provider.search(request.message, top_k=5)
+    context = "\n\n".join(doc.get("content", "") for doc in results)
+    
+    async def _stream():
+        try:
+            async for chunk in app.state.gemini_client.stream_answer(request.message, context):
+                # Each line of the chunk needs its own "data:" field
+                yield "".join(f"data: {line}\n" for line in chunk.split("\n")) + "\n"
+        except Exception as e:
+            yield f"event: error\ndata: {str(e)}\n\n"
+    
+    return StreamingResponse(_stream(), media_type="text/event-stream")
+
+
 # =============================================================================
 # KEP Endpoints (Same as Agent Alpha)
 # =============================================================================
@@ -300,7 +431,7 @@ async def chat(request: ChatRequest):
 @app.post("/api/v1/kep/register")
 async def register_agent(agent: AgentInfo):
     """Register an external agent."""
-    success = kep_handler.register_agent(agent)
+    success = await asyncio.to_thread(app.state.kep_handler.register_agent, agent)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to register agent")
     return {
@@ -313,15 +444,15 @@ async def register_agent(agent: AgentInfo):
 @app.get("/api/v1/kep/agents")
 async def list_agents():
     """List all registered external agents."""
-    agents = kep_handler.list_agents()
+    agents = await asyncio.to_thread(app.state.kep_handler.list_agents)
     return {
         "agents": [
             {
                 "agent_id": a.agent_id,
                 "name": a.name,
                 "domains": a.domains,
-                "registered_at": a.registered_at.isoformat(),
-                "last_active": a.last_active.isoformat() if a.last_active else None
+                "registered_at": a.registered_at,
+                "last_active": a.last_active
             }
             for a in agents
         ]
@@ -331,22 +462,29 @@ async def list_agents():
 @app.post("/api/v1/kep/request", response_model=KEPResponse)
 async def process_kep_request(request: KEPRequest):
     """Process a knowledge exchange request."""
-    response = await kep_handler.process_request(request)
+    response = await app.state.kep_handler.process_request(request)
     return response
 
 
 @app.get("/api/v1/kep/history")
 async def get_exchange_history(agent_id: Optional[str] = None, limit: int = 50):
     """Get history of knowledge exchanges."""
-    history = kep_handler.get_exchange_history(agent_id=agent_id, limit=limit)
+    history = await asyncio.to_thread(
+        app.state.kep_handler.get_exchange_history, agent_id=agent_id, limit=limit
+    )
     return {"exchanges": history}
 
 
 @app.post("/api/v1/kep/feedback")
 async def receive_feedback(feedback: KEPFeedback):
     """Receive feedback from external agents."""
+    # Only queues the row; the store's flusher writes it in the next batch
     store = get_feedback_store()
-    feedback_id = store.store_feedback(feedback)
+    try:
+        feedback_id = store.store_feedback(feedback)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
     return {
         "status": "success",
         "message": "Feedback received",
@@ -358,18 +496,10 @@ async def receive_feedback(feedback: KEPFeedback):
 # Assessment Endpoints
 # =============================================================================
 
-assessment_engine = SelfAssessmentEngine(
-    vector_provider=vector_provider,
-    graph_provider=graph_provider,
-    kep_handler=kep_handler,
-    db_path=BETA_ASSESSMENT_DB
-)
-
-
 @app.post("/api/v1/assessment/run")
 async def run_assessment(domain: Optional[str] = None):
     """Run self-assessment."""
-    report = await assessment_engine.run_assessment(domain=domain)
+    report = await app.state.assessment_engine.run_assessment(domain=domain)
     return {
         "timestamp": report.timestamp,
         "domain": report.domain,
@@ -383,37 +513,36 @@ async def run_assessment(domain: Optional[str] = None):
 # Startup Event
 # =============================================================================
 
-@app.on_event("startup")
 async def startup_event():
-    """Register with peer agent on startup."""
-    import httpx
-    
+    """Register with peer agents on startup."""
     print(f"\n{'='*60}")
     print(f"  {AGENT_NAME} starting on port {PORT}")
     print(f"  Agent ID: {AGENT_ID}")
     print(f"  Domain: {AGENT_DOMAIN}")
     print(f"{'='*60}\n")
     
-    # Try to register with peer agent
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{PEER_AGENT_URL}/api/v1/kep/register",
-                json={
-                    "agent_id": AGENT_ID,
-                    "name": AGENT_NAME,
-                    "callback_url": f"http://localhost:{PORT}/api/v1/kep/feedback",
-                    "domains": [AGENT_DOMAIN, "machine-learning", "deep-learning"]
-                },
-                timeout=5.0
-            )
-            if response.status_code == 200:
-                print(f"✅ Registered with peer agent at {PEER_AGENT_URL}")
-            else:
-                print(f"⚠️ Failed to register with peer agent: {response.text}")
-    except Exception as e:
-        print(f"⚠️ Peer agent not available: {e}")
-        print("   Will retry when peer comes online.")
+    # Register with all peer agents concurrently
+    payload = {
+        "agent_id": AGENT_ID,
+        "name": AGENT_NAME,
+        "callback_url": f"http://localhost:{PORT}/api/v1/kep/feedback",
+        "domains": [AGENT_DOMAIN, "machine-learning", "deep-learning"]
+    }
+    responses = await asyncio.gather(
+        *[
+            app.state.http.post(f"{peer_url}/api/v1/kep/register", json=payload, timeout=5.0)
+            for peer_url in PEER_AGENTS
+        ],
+        return_exceptions=True
+    )
+    
+    for peer_url, response in zip(PEER_AGENTS, responses):
+        if isinstance(response, Exception):
+            print(f"⚠️ Peer agent at {peer_url} not available: {response}")
+        elif response.status_code == 200:
+            print(f"✅ Registered with peer agent at {peer_url}")
+        else:
+            print(f"⚠️ Failed to register with {peer_url}: {response.text}")
 
 
 # =============================================================================
@@ -10,12 +10,20 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Deque
 import os
 import sys
+import asyncio
+import time
 import uuid
 import httpx
+import orjson
+import aiohttp
+from httpx_aiohttp import AiohttpTransport
 from datetime import datetime
+from collections import deque, defaultdict
+from itertools import islice
+from contextlib import asynccontextmanager
 
 # =============================================================================
 # Configuration
@@ -35,10 +43,31 @@ PEER_AGENTS = [
 # FastAPI App
 # =============================================================================
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Share one pooled HTTP client for all outbound calls and register with peers."""
+    # httpx API on top of aiohttp's connector, which holds up better under many concurrent calls
+    aiohttp_session = aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=60),
+        connector=aiohttp.TCPConnector(limit=200, keepalive_timeout=30)
+    )
+    app.state.http_client = httpx.AsyncClient(
+        transport=AiohttpTransport(client=aiohttp_session),
+        timeout=60.0
+    )
+    log_drainer = asyncio.create_task(_drain_logs())
+    await startup_event()
+    yield
+    log_drainer.cancel()
+    await app.state.http_client.aclose()
+    await aiohttp_session.close()
+
+
 app = FastAPI(
     title=f"Agent Gamma - {AGENT_NAME}",
     description="Data Analytics Agent for multi-agent knowledge exchange",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -108,7 +137,41 @@ class KEPResponse(BaseModel):
 # =============================================================================
 
 registered_agents: Dict[str, AgentInfo] = {}
-exchange_history: List[Dict] = []
+
+# Bounded history: oldest exchanges are dropped once the limit is reached
+EXCHANGE_HISTORY_SIZE = 10000
+EXCHANGE_HISTORY_PER_SENDER = 2000
+
+exchange_history: Deque[Dict] = deque(maxlen=EXCHANGE_HISTORY_SIZE)
+_history_by_sender: Dict[str, Deque[Dict]] = defaultdict(lambda: deque(maxlen=EXCHANGE_HISTORY_PER_SENDER))
+
+
+# Exchanges are queued by the handlers and written to the history in batches
+_log_queue: asyncio.Queue = asyncio.Queue()
+
+
+def log_exchange(entry: Dict) -> Dict:
+    """
+    Queue an exchange for the history.
+    
+    The timestamp is formatted by the drainer, off the request path. The entry
+    is returned so callers can still fill in fields (e.g. the response) later.
+    """
+    _log_queue.put_nowait((time.time(), entry))
+    return entry
+
+
+async def _drain_logs():
+    """Move queued exchanges into the global and per-sender history."""
+    while True:
+        batch = [await _log_queue.get()]
+        while not _log_queue.empty():
+            batch.append(_log_queue.get_nowait())
+        
+        for logged_at, entry in batch:
+            entry["timestamp"] = datetime.fromtimestamp(logged_at).isoformat()
+            exchange_history.append(entry)
+            _history_by_sender[entry["sender_agent_id"]].append(entry)
 
 
 # =============================================================================
@@ -164,6 +227,20 @@ class AskAlphaRequest(BaseModel):
     message: str
 
 
+# Constant part of the A2A message/send envelope; only id and text vary per call
+_BODY_TEMPLATE = {"jsonrpc": "2.0", "method": "message/send"}
+_JSON_HEADERS = {"content-type": "application/json"}
+
+
+def _a2a_message_body(request_id: str, text: str) -> bytes:
+    """Encode a message/send request with orjson, skipping httpx's JSON encoder."""
+    body = _BODY_TEMPLATE.copy()
+    body["id"] = request_id
+    # params is rebuilt rather than copied so the template is never mutated
+    body["params"] = {"message": {"role": "ROLE_USER", "parts": [{"text": text}]}}
+    return orjson.dumps(body)
+
+
 @app.post("/api/v1/ask-alpha")
 async def ask_alpha(request: AskAlphaRequest):
     """Forward question to DKMES Alpha via A2A protocol."""
@@ -171,67 +248,54 @@ async def ask_alpha(request: AskAlphaRequest):
     request_id = str(uuid.uuid4())
     
     try:
-                # Log the outgoing request
-        exchange_history.append({
+        # Log the outgoing request
+        entry = log_exchange({
             "request_id": request_id,
             "sender_agent_id": AGENT_ID,
             "receiver_agent_id": "dkmes-alpha",
             "query": request.message,
             "protocol": "A2A",
-            "timestamp": datetime.now().isoformat(),
             "direction": "outgoing",
             "confidence": 0.0  # Initialize to avoid NaN
         })
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            # Send A2A JSON-RPC request to Alpha
-            response = await client.post(
-                alpha_a2a_url,
-                json={
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "method": "message/send",
-                    "params": {
-                        "message": {
-                            "role": "ROLE_USER",
-                            "parts": [{"text": request.message}]
-                        }
-                    }
-                }
-            )
+        client = app.state.http_client
+        # Send A2A JSON-RPC request to Alpha
+        response = await client.post(
+            alpha_a2a_url,
+            content=_a2a_message_body(request_id, request.message),
+            headers=_JSON_HEADERS
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            result = data.get("result", {})
+            status = result.get("status", {})
+            
+            # Extract answer from status.message.parts
+            answer_text = "No answer received"
+            if status.get("message"):
+                parts = status["message"].get("parts", [])
+                if parts and parts[0].get("text"):
+                    answer_text = parts[0]["text"]
+            
+            # Update log with success and estimated confidence
+            entry["response"] = answer_text
+            entry["confidence"] = 0.95  # Assume high confidence for successful A2A
+            
+            return {
+                "answer": answer_text,
+                "status": status.get("state", "UNKNOWN"),
+                "task_id": result.get("id"),
+                "from_agent": "dkmes-alpha",
+                "protocol": "A2A"
+            }
+        else:
+            return {
+                "answer": f"Alpha returned error: {response.status_code}",
+                "error": True
+            }
             
-            if response.status_code == 200:
-                data = response.json()
-                result = data.get("result", {})
-                status = result.get("status", {})
-                
-                # Extract answer from status.message.parts
-                answer_text = "No answer received"
-                if status.get("message"):
-                    parts = status["message"].get("parts", [])
-                    if parts and parts[0].get("text"):
-                        answer_text = parts[0]["text"]
-                
-                # Update log with success and estimated confidence
-                for ex in exchange_history:
-                    if ex["request_id"] == request_id:
-                        ex["response"] = answer_text
-                        ex["confidence"] = 0.95  # Assume high confidence for successful A2A
-                        break
-                
-                return {
-                    "answer": answer_text,
-                    "status": status.get("state", "UNKNOWN"),
-                    "task_id": result.get("id"),
-                    "from_agent": "dkmes-alpha",
-                    "protocol": "A2A"
-                }
-            else:
-                return {
-                    "answer": f"Alpha returned error: {response.status_code}",
-                    "error": True
-                }
-                
     except httpx.TimeoutException:
         return {"answer": "Request to Alpha timed out", "error": True}
     except httpx.ConnectError:
@@ -275,13 +339,12 @@ async def list_agents():
 async def process_kep_request(request: KEPRequest):
     """Process a knowledge exchange request from another agent."""
     # Log the exchange
-    exchange_history.append({
+    log_exchange({
         "request_id": request.request_id,
         "sender_agent_id": request.sender_agent_id,
         "receiver_agent_id": AGENT_ID,
         "query": request.query,
         "domain": request.domain,
-        "timestamp": datetime.now().isoformat(),
         "confidence": 0.8
     })
     
@@ -301,47 +364,52 @@ async def process_kep_request(request: KEPRequest):
 @app.get("/api/v1/kep/history")
 async def get_exchange_history(agent_id: Optional[str] = None, limit: int = 50):
     """Get history of knowledge exchanges."""
-    history = exchange_history
-    if agent_id:
-        history = [h for h in history if h.get("sender_agent_id") == agent_id]
-    return {"exchanges": history[-limit:]}
+    # Per-sender deques are a secondary index, so filtering costs O(limit) rather than O(N)
+    history = _history_by_sender.get(agent_id, ()) if agent_id else exchange_history
+    # Last `limit` entries, oldest first
+    recent = list(islice(reversed(history), max(0, limit)))
+    recent.reverse()
+    return {"exchanges": recent}
 
 
 # =============================================================================
 # Startup Event
 # =============================================================================
 
-@app.on_event("startup")
 async def startup_event():
     """Register with peer agents on startup."""
-    import httpx
-    
     print(f"\n{'='*60}")
     print(f"  🚀 {AGENT_NAME} starting on port {PORT}")
     print(f"  Agent ID: {AGENT_ID}")
     print(f"  Domain: {AGENT_DOMAIN}")
     print(f"{'='*60}\n")
     
-    # Try to register with peer agents
-    for peer_url in PEER_AGENTS:
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{peer_url}/api/v1/kep/register",
-                    json={
-                        "agent_id": AGENT_ID,
-                        "name": AGENT_NAME,
-                        "callback_url": f"http://localhost:{PORT}/api/v1/kep/feedback",
-                        "domains": [AGENT_DOMAIN, "sql-analysis", "data-visualization"]
-                    },
-                    timeout=5.0
-                )
-                if response.status_code == 200:
-                    print(f"✅ Registered with peer agent at {peer_url}")
-                else:
-                    print(f"⚠️ Failed to register with {peer_url}: {response.text}")
-        except Exception as e:
-            print(f"⚠️ Peer agent at {peer_url} not available: {e}")
+    # Register with all peer agents concurrently
+    await asyncio.gather(
+        *(_register_with(peer_url, app.state.http_client) for peer_url in PEER_AGENTS),
+        return_exceptions=True
+    )
+
+
+async def _register_with(peer_url: str, client: httpx.AsyncClient):
+    """Register this agent with a single peer."""
+    try:
+        response = await client.post(
+            f"{peer_url}/api/v1/kep/register",
+            json={
+                "agent_id": AGENT_ID,
+                "name": AGENT_NAME,
+                "callback_url": f"http://localhost:{PORT}/api/v1/kep/feedback",
+                "domains": [AGENT_DOMAIN, "sql-analysis", "data-visualization"]
+            },
+            timeout=5.0
+        )
+        if response.status_code == 200:
+            print(f"✅ Registered with peer agent at {peer_url}")
+        else:
+            print(f"⚠️ Failed to register with {peer_url}: {response.text}")
+    except Exception as e:
+        print(f"⚠️ Peer agent at {peer_url} not available: {e}")
 
 
 # =============================================================================
@@ -350,4 +418,17 @@ async def startup_event():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=PORT)
+    
+    # Prefer the faster uvloop/httptools stack, fall back to the stdlib implementations
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    try:
+        import httptools  # noqa: F401
+        http = "httptools"
+    except ImportError:
+        http = "h11"
+    
+    uvicorn.run(app, host="0.0.0.0", port=PORT, loop=loop, http=http)
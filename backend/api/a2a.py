@@ -1,37 +1,50 @@
-from fastapi import APIRouter, HTTPException, Request
-from core.a2a import JsonRpcRequest, JsonRpcResponse, A2A_ERRORS
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from typing import List
+from core.a2a import JsonRpcRequest, JsonRpcResponse, A2A_ERRORS, Task, REQUEST_ADAPTER, body_error_name
+import asyncio
 import logging
+import orjson
+from itertools import chain
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 logger = logging.getLogger(__name__)
 
+def _log_task_failure(msg: str, task_id: str, exc: Exception):
+    """Log a failed task; the full traceback is only formatted when DEBUG is enabled."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.exception(msg, extra={"task_id": task_id})
+    else:
+        logger.warning("%s (task %s): %s", msg, task_id, exc, extra={"task_id": task_id})
+
 @router.post("/a2a")
 async def handle_a2a_rpc(request: Request):
     try:
-        data = await request.json()
-        rpc_req = JsonRpcRequest(**data)
+        # Parse and validate the raw body in one pass
+        rpc_req = REQUEST_ADAPTER.validate_json(await request.body())
     except Exception as e:
         return JsonRpcResponse(
             id=None,
-            error=A2A_ERRORS["PARSE_ERROR"]
+            error=A2A_ERRORS[body_error_name(e)]
         )
     
-    # Dispatch methods
-    if rpc_req.method == "message/send":
-        return await handle_message_send(rpc_req, request)
-    elif rpc_req.method == "tasks/get":
-        return await handle_task_get(rpc_req)
-    elif rpc_req.method == "tasks/list":
-        return await handle_task_list(rpc_req)
-    else:
+    # Dispatch methods (_DISPATCH is defined at the bottom, after the handlers)
+    handler = _DISPATCH.get(rpc_req.method)
+    if handler is None:
         return JsonRpcResponse(
             id=rpc_req.id,
             error=A2A_ERRORS["METHOD_NOT_FOUND"]
         )
+    return await handler(rpc_req, request)
 
 from core.task_manager import task_manager
 from core.a2a import Message, Part, Role, TaskState
-from core.gemini_client import GeminiClient
+from core.gemini_client import GeminiClient, ANSWER_FAILED
+from core.answer_cache import answer_cache
+
+async def _no_graph_results() -> dict:
+    return {"text_results": []}
 
 async def handle_message_send(req: JsonRpcRequest, request: Request) -> JsonRpcResponse:
     """Process A2A message synchronously using RAG."""
@@ -63,28 +76,49 @@ async def handle_message_send(req: JsonRpcRequest, request: Request) -> JsonRpcR
     try:
         # 5. Get providers from app state
         vector_provider = request.app.state.vector_provider
+        graph_provider = getattr(request.app.state, "graph_provider", None)
         gemini_client = request.app.state.gemini_client
         
-        # 6. Process with RAG (synchronous)
-        vector_results = await vector_provider.search(query, top_k=3)
-        context_parts = [doc.get("content", doc.get("text", "")) for doc in vector_results]
-        context = "\n\n".join(context_parts)
+        # 6. Repeated queries are answered from the answer cache
+        response_text = answer_cache.get(query)
+        cached = response_text is not None
         
-        response_text = await gemini_client.generate_answer(query, context)
+        if not cached:
+            # Process with RAG (synchronous); vector and graph retrieval run concurrently
+            vector_results, graph_results = await asyncio.gather(
+                vector_provider.search(query, top_k=3),
+                graph_provider.search(query) if graph_provider else _no_graph_results(),
+                return_exceptions=True
+            )
+            if isinstance(vector_results, BaseException):
+                raise vector_results
+            if isinstance(graph_results, BaseException):
+                # Graph context is supplementary; answer from the vector results alone
+                logger.warning("Graph search failed, using vector context only: %s", graph_results)
+                graph_results = None
+            graph_context = graph_results.get("text_results", []) if isinstance(graph_results, dict) else []
+            context = "\n\n".join(chain(
+                (doc.get("content") or doc.get("text", "") for doc in vector_results),
+                graph_context
+            ))
+            
+            response_text = await gemini_client.generate_answer(query, context)
+            if response_text != ANSWER_FAILED:
+                answer_cache.put(query, response_text)
         
         # 7. Create response message
         response_message = Message(
             taskId=task.id,
             role=Role.AGENT,
-            parts=[Part(text=response_text)]
+            parts=[Part(text=response_text)],
+            metadata={"cached": cached}
         )
         
         # 8. Update to COMPLETED
         task_manager.update_task_status(task.id, TaskState.COMPLETED, message=response_message)
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        _log_task_failure("A2A message handling failed", task.id, e)
         error_message = Message(
             taskId=task.id,
             role=Role.AGENT,
@@ -97,33 +131,15 @@ async def handle_message_send(req: JsonRpcRequest, request: Request) -> JsonRpcR
 
 # Start with task logic
 import asyncio
-from core.gemini_client import AgentResponse, AgenticGeminiClient, GeminiClient
+from core.gemini_client import AgentResponse, AgenticGeminiClient
 
-async def process_task_background(task_id: str, input_message: Message, client: GeminiClient):
+async def process_task_background(task_id: str, input_message: Message, client: AgenticGeminiClient):
     """
     Process the task using AgenticGeminiClient capabilities.
     """
     try:
-        # Check if the client supports tools (Agentic capabilities)
-        # In main.py, we initialize 'GeminiClient'. We need to upgrade this.
-        # But for now, we can check attribute or cast.
-        # Ideally, main.py should use AgenticGeminiClient.
-        
-        # NOTE: If client is base GeminiClient, it won't have 'generate_with_tools'.
-        # We'll handle this by checking if it has the method, or temporarily creating an agentic wrapper.
-        
+        # app.state.gemini_client is an AgenticGeminiClient, upgraded once at startup
         agentic_client = client
-        if not hasattr(client, 'generate_with_tools'):
-             # Create an AgenticGeminiClient sharing the same config
-             agentic_client = AgenticGeminiClient(
-                 project_id=client.project_id,
-                 location=client.location,
-                 model_name=client.model_name
-             )
-             # Manually copy API key if not in env (though it should be)
-             agentic_client.api_key = client.api_key
-             if client.is_mock:
-                 agentic_client.is_mock = True
 
         # Extract text input
         input_text = ""
@@ -159,8 +175,7 @@ async def process_task_background(task_id: str, input_message: Message, client:
         task_manager.update_task_status(task_id, TaskState.COMPLETED, message=response_message)
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        _log_task_failure("A2A background task failed", task_id, e)
         error_message = Message(
             taskId=task_id,
             role=Role.AGENT,
@@ -171,7 +186,7 @@ async def process_task_background(task_id: str, input_message: Message, client:
 
 
 
-async def handle_task_get(req: JsonRpcRequest) -> JsonRpcResponse:
+async def handle_task_get(req: JsonRpcRequest, request: Request) -> Response:
     task_id = req.params.get("taskId")
     if not task_id:
          return JsonRpcResponse(
@@ -186,18 +201,36 @@ async def handle_task_get(req: JsonRpcRequest) -> JsonRpcResponse:
              error={"code": -32000, "message": "Task not found"}
         )
         
-    return JsonRpcResponse(
-        id=req.id,
-        result=task.model_dump()
-    )
+    # Repeat polls of an unchanged task reuse its cached JSON bytes
+    body = orjson.dumps({
+        "jsonrpc": "2.0",
+        "result": orjson.Fragment(task.to_json_bytes()),
+        "error": None,
+        "id": req.id
+    })
+    return Response(content=body, media_type="application/json")
 
-async def handle_task_list(req: JsonRpcRequest) -> JsonRpcResponse:
+# Serializes a whole task list straight to JSON bytes in one pass
+_task_list_adapter = TypeAdapter(List[Task])
+
+async def handle_task_list(req: JsonRpcRequest, request: Request) -> Response:
     # Optional: support limit/offset in params
     params = req.params or {}
     limit = params.get("limit", 10)
     tasks = task_manager.list_tasks(limit=limit)
     
-    return JsonRpcResponse(
-        id=req.id,
-        result={"tasks": [t.model_dump() for t in tasks]}
-    )
+    # The pre-encoded task list is embedded as-is, so it is never serialized twice
+    body = orjson.dumps({
+        "jsonrpc": "2.0",
+        "result": {"tasks": orjson.Fragment(_task_list_adapter.dump_json(tasks))},
+        "error": None,
+        "id": req.id
+    })
+    return Response(content=body, media_type="application/json")
+
+# JSON-RPC method -> handler; every handler takes (req, request)
+_DISPATCH = {
+    "message/send": handle_message_send,
+    "tasks/get": handle_task_get,
+    "tasks/list": handle_task_list,
+}
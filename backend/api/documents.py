@@ -2,14 +2,75 @@ from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Background
 from typing import List, Dict
 import shutil
 import os
+import asyncio
 import uuid
 from pypdf import PdfReader
+from core.answer_cache import answer_cache
 
 router = APIRouter(tags=["documents"])
 
 UPLOAD_DIR = "data/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+COPY_BUFFER_SIZE = 1 << 20
+
+
+def _save_upload(src, dest_path: str):
+    """
+    Copy an upload to disk. Uses os.sendfile when the spooled upload already
+    rolled over to a real file; otherwise copies in 1 MiB blocks.
+    """
+    src.seek(0)
+    with open(dest_path, "wb") as out:
+        # fileno() would force an in-memory SpooledTemporaryFile to disk, so only use it once rolled
+        if hasattr(os, "sendfile") and getattr(src, "_rolled", True):
+            try:
+                size = os.fstat(src.fileno()).st_size
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(out.fileno(), src.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                return
+            except (OSError, AttributeError, ValueError):
+                src.seek(0)
+                out.seek(0)
+                out.truncate()
+        shutil.copyfileobj(src, out, COPY_BUFFER_SIZE)
+
+
+def _extract_pdf_text(path: str) -> str:
+    """Extract all page text from a PDF (runs in the PDF process pool)."""
+    reader = PdfReader(path)
+    return "\n".join((page.extract_text() or "") for page in reader.pages)
+
+
+def _scan_uploads_dir() -> List[Dict]:
+    """List uploaded files in a single scandir pass (runs in a worker thread)."""
+    if not os.path.exists(UPLOAD_DIR):
+        return []
+    with os.scandir(UPLOAD_DIR) as entries:
+        return [
+            {
+                "filename": entry.name,
+                "size": entry.stat().st_size,
+                "status": "processed"  # Assuming all in this dir are processed
+            }
+            for entry in entries if entry.is_file()
+        ]
+
+
+def _purge_uploads_dir():
+    """Delete every uploaded file (runs in a worker thread)."""
+    if not os.path.exists(UPLOAD_DIR):
+        return
+    with os.scandir(UPLOAD_DIR) as entries:
+        for entry in entries:
+            if entry.is_file():
+                os.remove(entry.path)
+
+
 @router.post("/upload")
 async def upload_document(request: Request, file: UploadFile = File(...), mode: str = Form("append")):
     # Get providers from app.state (shared with main.py)
@@ -20,17 +81,14 @@ async def upload_document(request: Request, file: UploadFile = File(...), mode:
         # Handle replace mode - clear all existing data
         if mode == "replace":
             # Clear uploaded files
-            if os.path.exists(UPLOAD_DIR):
-                for filename in os.listdir(UPLOAD_DIR):
-                    file_path_to_delete = os.path.join(UPLOAD_DIR, filename)
-                    if os.path.isfile(file_path_to_delete):
-                        os.remove(file_path_to_delete)
+            await asyncio.to_thread(_purge_uploads_dir)
             
             # Clear Vector DB
             await vector_provider.clear()
             
             # Clear Graph DB
             await graph_provider.clear()
+            answer_cache.clear()
             
             print("🔄 Replace mode: Cleared all existing data")
         
@@ -38,16 +96,15 @@ async def upload_document(request: Request, file: UploadFile = File(...), mode:
         file_ext = os.path.splitext(file.filename)[1].lower()
         file_path = os.path.join(UPLOAD_DIR, f"{file_id}_{file.filename}")
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await asyncio.to_thread(_save_upload, file.file, file_path)
             
         # Process immediately (or use BackgroundTasks)
         text_content = ""
         
         if file_ext == ".pdf":
-            reader = PdfReader(file_path)
-            for page in reader.pages:
-                text_content += page.extract_text() + "\n"
+            # pypdf is CPU-bound; run it in the process pool so the loop stays free
+            loop = asyncio.get_running_loop()
+            text_content = await loop.run_in_executor(request.app.state.pdf_pool, _extract_pdf_text, file_path)
         elif file_ext in [".txt", ".md", ".csv"]:
             with open(file_path, "r", encoding="utf-8") as f:
                 text_content = f.read()
@@ -55,11 +112,18 @@ async def upload_document(request: Request, file: UploadFile = File(...), mode:
             return {"message": "File saved but format not supported for auto-ingestion", "filename": file.filename}
 
         if text_content:
-            # Ingest into Vector DB
-            await vector_provider.ingest(text_content)
-            
-            # Ingest into Graph DB
-            await graph_provider.ingest(text_content)
+            # Ingest into Vector DB and Graph DB concurrently
+            results = await asyncio.gather(
+                vector_provider.ingest(text_content),
+                graph_provider.ingest(text_content),
+                return_exceptions=True
+            )
+            # Cached A2A answers may be stale now that the knowledge base changed,
+            # even if only one of the stores took the new text
+            answer_cache.clear()
+            errors = [r for r in results if isinstance(r, Exception)]
+            if errors:
+                raise errors[0]
 
         return {
             "id": file_id,
@@ -74,14 +138,4 @@ async def upload_document(request: Request, file: UploadFile = File(...), mode:
 
 @router.get("/")
 async def list_documents():
-    files = []
-    if os.path.exists(UPLOAD_DIR):
-        for filename in os.listdir(UPLOAD_DIR):
-            file_path = os.path.join(UPLOAD_DIR, filename)
-            if os.path.isfile(file_path):
-                files.append({
-                    "filename": filename,
-                    "size": os.path.getsize(file_path),
-                    "status": "processed" # Assuming all in this dir are processed
-                })
-    return files
+    return await asyncio.to_thread(_scan_uploads_dir)
@@ -1,5 +1,10 @@
+import os
+import threading
+import uuid
+import time
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, ValidationError
 
 # ============================================================================
 # A2A Data Models (Agent Card)
@@ -17,10 +22,16 @@ class A2ASkill(BaseModel):
     id: str
     name: str
     description: str
-    tags: List[str] = []
-    inputModes: List[str] = ["text/plain"]
-    outputModes: List[str] = ["text/plain"]
-    examples: List[str] = []
+    tags: List[str] = Field(default_factory=list)
+    inputModes: List[str] = Field(default_factory=lambda: ["text/plain"])
+    outputModes: List[str] = Field(default_factory=lambda: ["text/plain"])
+    examples: List[str] = Field(default_factory=list)
+
+DEFAULT_CAPABILITIES = {
+    "streaming": False,
+    "pushNotifications": False,
+    "stateTransitionHistory": True
+}
 
 class AgentCard(BaseModel):
     protocolVersion: str = "0.3.0"
@@ -30,11 +41,7 @@ class AgentCard(BaseModel):
     supportedInterfaces: List[A2AInterface]
     provider: A2AProvider
     skills: List[A2ASkill]
-    capabilities: Dict[str, bool] = {
-        "streaming": False,
-        "pushNotifications": False,
-        "stateTransitionHistory": True
-    }
+    capabilities: Dict[str, bool] = Field(default_factory=lambda: dict(DEFAULT_CAPABILITIES))
 
 # ============================================================================
 # DKMES Agent Card Configuration
@@ -75,6 +82,9 @@ dkmes_agent_card = AgentCard(
     ]
 )
 
+# The card never changes after import, so serialize it once
+_AGENT_CARD_JSON = dkmes_agent_card.model_dump_json().encode()
+
 
 
 # ============================================================================
@@ -101,7 +111,7 @@ class Part(BaseModel):
     text: Optional[str] = None
     # file: Optional[FilePart] = None # Implement later if needed
     # data: Optional[DataPart] = None # Implement later if needed
-    metadata: Dict[str, Any] = {}
+    metadata: Dict[str, Any] = Field(default_factory=dict)
 
 class Message(BaseModel):
     messageId: str = Field(default_factory=lambda: "") # To be generated
@@ -109,7 +119,7 @@ class Message(BaseModel):
     taskId: Optional[str] = None
     role: str = Role.USER
     parts: List[Part]
-    metadata: Dict[str, Any] = {}
+    metadata: Dict[str, Any] = Field(default_factory=dict)
     extensions: Optional[str] = None
     referenceTaskIds: Optional[str] = None
 
@@ -122,9 +132,21 @@ class Task(BaseModel):
     id: str
     contextId: Optional[str] = None
     status: TaskStatus
-    artifacts: List[Any] = [] # Artifacts not fully defined yet, using list for now
-    history: List[Message] = []
-    metadata: Dict[str, Any] = {}
+    artifacts: List[Any] = Field(default_factory=list) # Artifacts not fully defined yet, using list for now
+    history: List[Message] = Field(default_factory=list)
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    # Serialized JSON cache for tasks/get polling; cleared by TaskManager on every change
+    _serialized: Optional[bytes] = PrivateAttr(default=None)
+
+    def touch(self):
+        """Mark the task as changed so the next tasks/get re-serializes it."""
+        self._serialized = None
+
+    def to_json_bytes(self) -> bytes:
+        """JSON bytes for this task, reused until the task changes."""
+        if self._serialized is None:
+            self._serialized = self.model_dump_json().encode()
+        return self._serialized
 
 
 # ============================================================================
@@ -162,8 +184,99 @@ A2A_ERRORS = {
 # A2A Handler
 # ============================================================================
 
-import uuid
-import time
+UUID_BATCH = 256
+
+def _uuid_pool():
+    """Yield uuid4 strings generated from one os.urandom read per batch."""
+    while True:
+        buf = os.urandom(16 * UUID_BATCH)
+        for i in range(0, len(buf), 16):
+            yield str(uuid.UUID(bytes=buf[i:i + 16], version=4))
+
+_UUID_ITER = _uuid_pool()
+_UUID_LOCK = threading.Lock()  # generators can't be advanced from two threads at once
+
+def next_uuid() -> str:
+    """Drop-in replacement for str(uuid.uuid4()); safe to call from any thread."""
+    with _UUID_LOCK:
+        return next(_UUID_ITER)
+
+
+# Response shaping for A2AHandler. The server builds these objects itself, so
+# plain dicts are produced directly instead of going through model_dump().
+
+def _rpc_result(request_id: Any, result: Any) -> Dict:
+    return {"jsonrpc": "2.0", "result": result, "error": None, "id": request_id}
+
+def _rpc_error(request_id: Any, error: Dict[str, Any]) -> Dict:
+    return {"jsonrpc": "2.0", "result": None, "error": error, "id": request_id}
+
+def _valid_send_params(params: Dict) -> bool:
+    """Type-check the client fields message/send copies into unvalidated models."""
+    message = params.get("message", {})
+    if not isinstance(message, dict):
+        return False
+    parts = message.get("parts", [])
+    return (
+        isinstance(parts, list)
+        and all(isinstance(part, dict) and isinstance(part.get("text") or "", str) for part in parts)
+        and isinstance(params.get("contextId") or "", str)
+        and isinstance(params.get("metadata", {}), dict)
+    )
+
+# Built once so every request reuses the compiled validator
+REQUEST_ADAPTER = TypeAdapter(JsonRpcRequest)
+
+def body_error_name(exc: Exception) -> str:
+    """A2A_ERRORS key for a body REQUEST_ADAPTER rejected: malformed JSON vs. a bad request object."""
+    if isinstance(exc, ValidationError) and any(err["type"] == "json_invalid" for err in exc.errors()):
+        return "PARSE_ERROR"
+    return "INVALID_REQUEST"
+
+# Ready-made envelopes for the standard errors; only "id" is filled in per request
+_ERR_TEMPLATES = {name: _rpc_error(None, error) for name, error in A2A_ERRORS.items()}
+
+def _msg_to_dict(message: Optional[Message]) -> Optional[Dict]:
+    if message is None:
+        return None
+    return {
+        "messageId": message.messageId,
+        "contextId": message.contextId,
+        "taskId": message.taskId,
+        "role": message.role,
+        "parts": [{"text": p.text, "metadata": p.metadata} for p in message.parts],
+        "metadata": message.metadata,
+        "extensions": message.extensions,
+        "referenceTaskIds": message.referenceTaskIds,
+    }
+
+def _agent_message(task_id: str, text: str, role: str = Role.AGENT) -> Message:
+    """Build a single-text-part Message from trusted values, skipping validation."""
+    return Message.model_construct(
+        messageId=next_uuid(),
+        contextId=None,
+        taskId=task_id,
+        role=role,
+        parts=[Part.model_construct(text=text, metadata={})],
+        metadata={},
+        extensions=None,
+        referenceTaskIds=None
+    )
+
+def task_to_dict(task: Task) -> Dict:
+    """Same shape as task.model_dump(), built from the typed fields directly."""
+    return {
+        "id": task.id,
+        "contextId": task.contextId,
+        "status": {
+            "state": task.status.state,
+            "message": _msg_to_dict(task.status.message),
+            "timestamp": task.status.timestamp,
+        },
+        "artifacts": task.artifacts,
+        "history": [_msg_to_dict(m) for m in task.history],
+        "metadata": task.metadata,
+    }
 
 class A2AHandler:
     """
@@ -175,17 +288,19 @@ class A2AHandler:
     - tasks/cancel: Cancel a task
     """
     
-    def __init__(self, agent_id: str, process_message_fn):
+    def __init__(self, agent_id: str, process_message_fn, max_tasks: int = 10_000):
         """
         Initialize A2A handler.
         
         Args:
             agent_id: This agent's unique identifier
             process_message_fn: Async function(query: str) -> str that processes messages
+            max_tasks: Tasks kept in memory; the least recently used are evicted beyond this
         """
         self.agent_id = agent_id
         self.process_message_fn = process_message_fn
-        self.tasks: Dict[str, Task] = {}
+        self.tasks: "OrderedDict[str, Task]" = OrderedDict()
+        self._max_tasks = max_tasks
     
     async def handle_request(self, request_data: Dict) -> Dict:
         """
@@ -194,88 +309,74 @@ class A2AHandler:
         Routes to appropriate method handler.
         """
         try:
-            request = JsonRpcRequest(**request_data)
+            request = REQUEST_ADAPTER.validate_python(request_data)
         except Exception as e:
-            return JsonRpcResponse(
-                id=request_data.get("id", "unknown"),
-                error=A2A_ERRORS["INVALID_REQUEST"]
-            ).model_dump()
+            return {**_ERR_TEMPLATES["INVALID_REQUEST"], "id": request_data.get("id", "unknown")}
         
+        return await self._dispatch(request)
+    
+    async def _dispatch(self, request: JsonRpcRequest) -> Dict:
         method = request.method
         
         try:
             if method == "message/send":
+                if not _valid_send_params(request.params):
+                    return {**_ERR_TEMPLATES["INVALID_PARAMS"], "id": request.id}
                 result = await self._handle_send_message(request.params)
-                return JsonRpcResponse(id=request.id, result=result).model_dump()
+                return _rpc_result(request.id, result)
             
             elif method == "tasks/get":
                 result = await self._handle_get_task(request.params)
-                return JsonRpcResponse(id=request.id, result=result).model_dump()
+                return _rpc_result(request.id, result)
             
             elif method == "tasks/cancel":
                 result = await self._handle_cancel_task(request.params)
-                return JsonRpcResponse(id=request.id, result=result).model_dump()
+                return _rpc_result(request.id, result)
             
             else:
-                return JsonRpcResponse(
-                    id=request.id,
-                    error=A2A_ERRORS["METHOD_NOT_FOUND"]
-                ).model_dump()
+                return {**_ERR_TEMPLATES["METHOD_NOT_FOUND"], "id": request.id}
         
         except Exception as e:
-            return JsonRpcResponse(
-                id=request.id,
-                error={"code": -32603, "message": f"Internal error: {str(e)}"}
-            ).model_dump()
+            return _rpc_error(request.id, {"code": -32603, "message": f"Internal error: {str(e)}"})
     
     async def _handle_send_message(self, params: Dict) -> Dict:
         """Handle message/send - process a message and return response."""
         message_data = params.get("message", {})
         parts = message_data.get("parts", [])
         
-        # Extract text from message parts
-        query_parts = []
-        for part in parts:
-            if part.get("text"):
-                query_parts.append(part["text"])
-        
-        query = " ".join(query_parts)
+        # Extract text from message parts (one lookup per part)
+        query = " ".join(text for part in parts if (text := part.get("text")))
         
         # Create task in WORKING state
-        task_id = str(uuid.uuid4())
-        context_id = params.get("contextId") or str(uuid.uuid4())
+        task_id = next_uuid()
+        context_id = params.get("contextId") or next_uuid()
         
-        task = Task(
+        # Client fields were type-checked in _dispatch, so model_construct is safe here
+        task = Task.model_construct(
             id=task_id,
             contextId=context_id,
-            status=TaskStatus(
+            status=TaskStatus.model_construct(
                 state=TaskState.WORKING,
+                message=None,
                 timestamp=time.time()
             ),
-            history=[Message(
-                messageId=str(uuid.uuid4()),
-                taskId=task_id,
-                role=Role.USER,
-                parts=[Part(text=query)]
-            )],
+            artifacts=[],
+            history=[_agent_message(task_id, query, role=Role.USER)],
             metadata=params.get("metadata", {})
         )
         self.tasks[task_id] = task
+        if len(self.tasks) > self._max_tasks:
+            self.tasks.popitem(last=False)
         
         # Process the message
         try:
             response_text = await self.process_message_fn(query)
             
             # Create response message
-            response_message = Message(
-                messageId=str(uuid.uuid4()),
-                taskId=task_id,
-                role=Role.AGENT,
-                parts=[Part(text=response_text)]
-            )
+            response_message = _agent_message(task_id, response_text)
             
             # Update task to COMPLETED
-            task.status = TaskStatus(
+            task.status = TaskStatus.model_construct(
                 state=TaskState.COMPLETED,
                 message=response_message,
                 timestamp=time.time()
@@ -285,19 +386,14 @@ class A2AHandler:
             
         except Exception as e:
             # Update task to FAILED
-            error_message = Message(
-                messageId=str(uuid.uuid4()),
-                taskId=task_id,
-                role=Role.AGENT,
-                parts=[Part(text=str(e))]
-            )
-            task.status = TaskStatus(
+            error_message = _agent_message(task_id, str(e))
+            task.status = TaskStatus.model_construct(
                 state=TaskState.FAILED,
                 message=error_message,
                 timestamp=time.time()
             )
         
-        return task.model_dump()
+        return task_to_dict(task)
     
     async def _handle_get_task(self, params: Dict) -> Dict:
         """Handle tasks/get - retrieve task status."""
@@ -308,8 +404,9 @@ class A2AHandler:
         task = self.tasks.get(task_id)
         if not task:
             raise ValueError(f"Task not found: {task_id}")
+        self.tasks.move_to_end(task_id)
         
-        return task.model_dump()
+        return task_to_dict(task)
     
     async def _handle_cancel_task(self, params: Dict) -> Dict:
         """Handle tasks/cancel - cancel a task."""
@@ -320,109 +417,11 @@ class A2AHandler:
         task = self.tasks.get(task_id)
         if not task:
             raise ValueError(f"Task not found: {task_id}")
+        self.tasks.move_to_end(task_id)
         
-        task.status = TaskStatus(
+        task.status = TaskStatus.model_construct(
             state=TaskState.CANCELLED,
+            message=None,
             timestamp=time.time()
         )
-        return task.model_dump()
-
-
-# ============================================================================
-# A2A Client
-# ============================================================================
-
-class A2AClient:
-    """
-    Client for making A2A requests to other agents.
-    """
-    
-    def __init__(self, my_agent_id: str):
-        self.my_agent_id = my_agent_id
-        self.discovered_agents: Dict[str, AgentCard] = {}
-    
-    async def discover_agent(self, base_url: str) -> Optional[AgentCard]:
-        """Discover an agent by fetching its Agent Card."""
-        import httpx
-        
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{base_url}/.well-known/agent.json",
-                    timeout=10.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    card = AgentCard(**data)
-                    self.discovered_agents[base_url] = card
-                    return card
-                    
-        except Exception as e:
-            print(f"Failed to discover agent at {base_url}: {e}")
-        
-        return None
-    
-    async def send_message(
-        self, 
-        agent_url: str, 
-        message: str,
-        context_id: Optional[str] = None
-    ) -> Optional[Task]:
-        """Send a message to another agent via A2A."""
-        import httpx
-        
-        request = JsonRpcRequest(
-            jsonrpc="2.0",
-            id=str(uuid.uuid4()),
-            method="message/send",
-            params={
-                "message": {
-                    "role": Role.USER,
-                    "parts": [{"text": message}]
-                },
-                "contextId": context_id
-            }
-        )
-        
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    agent_url,
-                    json=request.model_dump(),
-                    timeout=60.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    if data.get("error"):
-                        print(f"A2A error: {data['error']}")
-                        return None
-                    
-                    result = data.get("result", {})
-                    return Task(**result)
-                    
-        except Exception as e:
-            print(f"A2A request failed: {e}")
-        
-        return None
-    
-    def get_response_text(self, task: Task) -> str:
-        """Extract the text response from a completed task."""
-        if task.artifacts:
-            for artifact in task.artifacts:
-                parts = artifact.get("parts", []) if isinstance(artifact, dict) else []
-                for part in parts:
-                    text = part.get("text") if isinstance(part, dict) else None
-                    if text:
-                        return text
-        
-        # Fallback to status message
-        if task.status.message:
-            for part in task.status.message.parts:
-                if part.text:
-                    return part.text
-        
-        return ""
-
+        return task_to_dict(task)
@@ -1,20 +1,74 @@
 import httpx
+import orjson
 import asyncio
-import uuid
 import logging
-from typing import Dict, Any, Optional
-from core.a2a import JsonRpcRequest, JsonRpcResponse, Message, Task, TaskState
+import ssl
+from typing import ClassVar, Dict, Any, List, Optional, Tuple, Union
+from core.a2a import JsonRpcRequest, JsonRpcResponse, Message, Part, Task, TaskState, TaskStatus, next_uuid
 
 logger = logging.getLogger(__name__)
 
+# One pooled client shared by every A2A call so connections are reused across requests
+_shared_client: Optional[httpx.AsyncClient] = None
+# Built at import so the first A2A call doesn't pay for loading the CA bundle
+_SSL_CTX = ssl.create_default_context()
+
+def shared_http_client() -> httpx.AsyncClient:
+    """Return the process-wide A2A HTTP client, creating it on first use."""
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+            timeout=httpx.Timeout(30.0),
+            verify=_SSL_CTX
+        )
+    return _shared_client
+
+async def close_shared_http_client():
+    """Close the shared client; called from the app's shutdown."""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
+
+def _message_from_trusted(data: Optional[Dict[str, Any]]) -> Optional[Message]:
+    if data is None:
+        return None
+    return Message.model_construct(**{**data, "parts": [Part.model_construct(**p) for p in data.get("parts", [])]})
+
+def _task_from_trusted(data: Dict[str, Any]) -> Task:
+    """Build a Task from a trusted peer's JSON without running pydantic validation."""
+    status = data.get("status") or {}
+    return Task.model_construct(**{
+        **data,
+        "status": TaskStatus.model_construct(**{**status, "message": _message_from_trusted(status.get("message"))}),
+        "history": [_message_from_trusted(m) for m in data.get("history", [])]
+    })
+
+
 class A2AClient:
     """
     Client for interacting with other A2A-compliant agents.
     Implements JSON-RPC 2.0 over HTTP.
+    
+    Use A2AClient.get(url) to share one instance per peer across call sites.
     """
-    def __init__(self, agent_url: str, timeout: int = 30):
+    _INSTANCES: ClassVar[Dict[str, "A2AClient"]] = {}
+
+    @classmethod
+    def get(cls, agent_url: str) -> "A2AClient":
+        """Return the shared client for a peer, creating it on first use."""
+        key = agent_url.rstrip("/")
+        inst = cls._INSTANCES.get(key)
+        if inst is None:
+            inst = cls._INSTANCES[key] = cls(key)
+        return inst
+
+    def __init__(self, agent_url: str, timeout: int = 30, trust_peer: bool = True):
         self.agent_url = agent_url.rstrip("/")
         self.timeout = timeout
+        # Trusted peers' tasks are built with model_construct; others are fully validated
+        self.trust_peer = trust_peer
         self.headers = {
             "Content-Type": "application/json",
             "User-Agent": "DKMES-A2A-Client/1.0"
@@ -24,10 +78,10 @@ class A2AClient:
         """Fetch the agent's capabilities card."""
         try:
             url = f"{self.agent_url}/.well-known/agent.json"
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                resp = await client.get(url, headers=self.headers)
-                resp.raise_for_status()
-                return resp.json()
+            client = shared_http_client()
+            resp = await client.get(url, headers=self.headers, timeout=self.timeout)
+            resp.raise_for_status()
+            return orjson.loads(resp.content)
         except Exception as e:
             logger.error(f"Failed to fetch Agent Card from {self.agent_url}: {e}")
             raise
@@ -37,7 +91,7 @@ class A2AClient:
         Send a message to the agent to start a task.
         Method: message/send
         """
-        request_id = str(uuid.uuid4())
+        request_id = next_uuid()
         payload = {
             "jsonrpc": "2.0",
             "method": "message/send",
@@ -49,15 +103,33 @@ class A2AClient:
         }
         
         rpc_resp = await self._post_rpc(payload)
-        task_data = rpc_resp.result
-        return Task(**task_data)
+        return self._parse_task(rpc_resp.result)
+
+    @classmethod
+    async def send_to_many(
+        cls,
+        targets: List[Tuple[str, str]],
+        timeout: Optional[float] = None
+    ) -> List[Union[Task, Exception]]:
+        """
+        Send (agent_url, text) messages to several peers concurrently.
+        Results are in target order; a failed or timed-out peer yields its exception.
+        """
+        async def send_one(agent_url: str, text: str) -> Task:
+            send = cls.get(agent_url).send_message({"role": "user", "parts": [{"text": text}]})
+            return await asyncio.wait_for(send, timeout) if timeout else await send
+
+        return await asyncio.gather(
+            *(send_one(url, text) for url, text in targets),
+            return_exceptions=True
+        )
 
     async def get_task(self, task_id: str) -> Task:
         """
         Get the current status of a task.
         Method: tasks/get
         """
-        request_id = str(uuid.uuid4())
+        request_id = next_uuid()
         payload = {
             "jsonrpc": "2.0",
             "method": "tasks/get",
@@ -68,15 +140,14 @@ class A2AClient:
         }
         
         rpc_resp = await self._post_rpc(payload)
-        task_data = rpc_resp.result
-        return Task(**task_data)
+        return self._parse_task(rpc_resp.result)
 
     async def list_tasks(self, limit: int = 10) -> Dict[str, Any]:
         """
         List active tasks.
         Method: tasks/list
         """
-        request_id = str(uuid.uuid4())
+        request_id = next_uuid()
         payload = {
             "jsonrpc": "2.0",
             "method": "tasks/list",
@@ -89,6 +160,30 @@ class A2AClient:
         rpc_resp = await self._post_rpc(payload)
         return rpc_resp.result
 
+    @staticmethod
+    def get_response_text(task: Task) -> str:
+        """Extract the text response from a completed task."""
+        if task.artifacts:
+            for artifact in task.artifacts:
+                parts = artifact.get("parts", []) if isinstance(artifact, dict) else []
+                for part in parts:
+                    text = part.get("text") if isinstance(part, dict) else None
+                    if text:
+                        return text
+        
+        # Fallback to status message
+        if task.status.message:
+            for part in task.status.message.parts:
+                if part.text:
+                    return part.text
+        
+        return ""
+
+    def _parse_task(self, task_data: Dict[str, Any]) -> Task:
+        if self.trust_peer:
+            return _task_from_trusted(task_data)
+        return Task.model_validate(task_data)
+
     async def _post_rpc(self, payload: Dict[str, Any]) -> JsonRpcResponse:
         """Helper to send JSON-RPC POST request."""
         url = f"{self.agent_url}/a2a"  # Assumes standard path, or should be config
@@ -100,27 +195,28 @@ class A2AClient:
         
         # NOTE: DKMES backend mounts at /a2a.
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            try:
-                resp = await client.post(url, json=payload, headers=self.headers)
-                resp.raise_for_status()
-                data = resp.json()
-                
-                # Parse response
-                # Note: JsonRpcResponse model validation might fail if result is generic dict vs strict model
-                # We used strict model in a2a.py, let's just return object wrapper
-                
-                if "error" in data and data["error"]:
-                    raise Exception(f"A2A Error {data['error'].get('code')}: {data['error'].get('message')}")
-                
-                return JsonRpcResponse(**data)
-                
-            except httpx.HTTPStatusError as e:
-                logger.error(f"HTTP Error {e.response.status_code}: {e.response.text}")
-                raise
-            except Exception as e:
-                logger.error(f"RPC Call Failed: {e}")
-                raise
+        client = shared_http_client()
+        try:
+            # orjson on both sides of the wire; self.headers already sets Content-Type
+            resp = await client.post(url, content=orjson.dumps(payload), headers=self.headers, timeout=self.timeout)
+            resp.raise_for_status()
+            data = orjson.loads(resp.content)
+            
+            # Parse response
+            # Note: JsonRpcResponse model validation might fail if result is generic dict vs strict model
+            # We used strict model in a2a.py, let's just return object wrapper
+            
+            if "error" in data and data["error"]:
+                raise Exception(f"A2A Error {data['error'].get('code')}: {data['error'].get('message')}")
+            
+            return JsonRpcResponse(**data)
+            
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP Error {e.response.status_code}: {e.response.text}")
+            raise
+        except Exception as e:
+            logger.error(f"RPC Call Failed: {e}")
+            raise
 
     async def ask_and_wait(self, question: str, poll_interval: float = 1.0, max_retries: int = 30) -> str:
         """
@@ -134,22 +230,37 @@ class A2AClient:
         task = await self.send_message(msg)
         logger.info(f"Task started: {task.id}")
         
+        # message/send on DKMES agents completes the task inline, so the reply
+        # usually already carries the answer and no polling is needed
+        answer = self._terminal_answer(task)
+        if answer is not None:
+            return answer
+        
         # 2. Poll
         for _ in range(max_retries):
             await asyncio.sleep(poll_interval)
             task = await self.get_task(task.id)
             
-            if task.status.state == TaskState.COMPLETED:
-                # Extract answer
-                if task.status.message and task.status.message.parts:
-                    return task.status.message.parts[0].text
-                return "Task completed but returned no content."
-            
-            if task.status.state == TaskState.FAILED:
-                error = "Task failed."
-                if task.status.message and task.status.message.parts:
-                    error += f" Reason: {task.status.message.parts[0].text}"
-                return error
+            answer = self._terminal_answer(task)
+            if answer is not None:
+                return answer
         
         # 3. Timeout
         return "Task timed out waiting for response."
+
+    @staticmethod
+    def _terminal_answer(task: Task) -> Optional[str]:
+        """Answer text for a finished task, or None while it is still running."""
+        if task.status.state == TaskState.COMPLETED:
+            # Extract answer
+            if task.status.message and task.status.message.parts:
+                return task.status.message.parts[0].text
+            return "Task completed but returned no content."
+        
+        if task.status.state == TaskState.FAILED:
+            error = "Task failed."
+            if task.status.message and task.status.message.parts:
+                error += f" Reason: {task.status.message.parts[0].text}"
+            return error
+        
+        return None
@@ -0,0 +1,51 @@
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class AnswerCache:
+    """
+    Remembers recent A2A answers so repeated queries skip the RAG + LLM round trip.
+
+    Keys are the normalized query text (lowercased words, punctuation and spacing
+    ignored). Embedding similarity is deliberately not used: "is X supported" and
+    "is X not supported" embed within a few hundredths of each other.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(re.findall(r"\w+", text.lower()))
+
+    def get(self, query: str) -> Optional[str]:
+        """Return the cached answer for this query, if still fresh."""
+        key = self.normalize(query)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, answer = entry
+        if time.time() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def put(self, query: str, answer: str):
+        """Store an answer, evicting the least recently used beyond max_entries."""
+        key = self.normalize(query)
+        self._entries[key] = (time.time(), answer)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Global instance
+answer_cache = AnswerCache()
@@ -7,15 +7,46 @@ Enables DKMES to evaluate its own knowledge quality based on:
 3. Document freshness
 """
 
+import asyncio
 import sqlite3
-import json
+import orjson
 import time
-from typing import Dict, List, Any, Optional
+from typing import Awaitable, Dict, Iterator, List, Any, Optional
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from enum import Enum
 
 from core.feedback import get_feedback_aggregator, FeedbackStats
+from core.db import LocalConnection, iso_timestamp
+
+
+INSERT_ASSESSMENT_SQL = """
+    INSERT INTO assessments 
+    (timestamp, domain, overall_score, usefulness, coverage, consistency, freshness, recommendations)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+ASSESSMENT_HISTORY_SQL = "SELECT * FROM assessments ORDER BY timestamp DESC LIMIT ?"
+
+SCORE_TREND_SQL = """
+    SELECT timestamp, overall_score, usefulness, coverage, consistency, freshness
+    FROM assessments 
+    WHERE timestamp > ?
+    ORDER BY timestamp ASC
+"""
+
+
+async def _empty_stats() -> Dict[str, Any]:
+    return {}
+
+
+def _iter_rows(cursor: sqlite3.Cursor, batch_size: int = 256) -> Iterator[sqlite3.Row]:
+    """Yield rows from an executed cursor in fetchmany batches."""
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return
+        yield from batch
 
 
 class AssessmentDimension(str, Enum):
@@ -26,6 +57,10 @@ class AssessmentDimension(str, Enum):
     FRESHNESS = "freshness"  # Age of knowledge
 
 
+# Each dimension score is stored in its own REAL column of the same name
+DIMENSION_COLUMNS = tuple(d.value for d in AssessmentDimension)
+
+
 @dataclass
 class DimensionScore:
     """Score for a single assessment dimension."""
@@ -68,11 +103,12 @@ class SelfAssessmentEngine:
         self.graph_provider = graph_provider
         self.kep_handler = kep_handler
         self.db_path = db_path
+        self._conn = LocalConnection(db_path)
         self._init_db()
     
     def _init_db(self):
         """Initialize database for storing assessment history."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._conn()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -81,31 +117,53 @@ class SelfAssessmentEngine:
                 timestamp REAL,
                 domain TEXT,
                 overall_score REAL,
-                dimensions TEXT,
+                usefulness REAL,
+                coverage REAL,
+                consistency REAL,
+                freshness REAL,
                 recommendations TEXT
             )
         """)
         
-        conn.commit()
-        conn.close()
+        # Older databases kept dimension scores in a JSON `dimensions` column:
+        # add the per-dimension columns and backfill them once
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(assessments)")}
+        missing = [name for name in DIMENSION_COLUMNS if name not in columns]
+        for name in missing:
+            cursor.execute(f"ALTER TABLE assessments ADD COLUMN {name} REAL")
+        if missing and "dimensions" in columns:
+            rows = cursor.execute("SELECT id, dimensions FROM assessments").fetchall()
+            updates = []
+            for row_id, dimensions in rows:
+                scores = orjson.loads(dimensions) if dimensions else {}
+                updates.append(tuple(scores.get(name) for name in DIMENSION_COLUMNS) + (row_id,))
+            cursor.executemany(
+                "UPDATE assessments SET usefulness = ?, coverage = ?, consistency = ?, freshness = ? WHERE id = ?",
+                updates
+            )
     
-    async def run_assessment(self, domain: Optional[str] = None) -> AssessmentReport:
+    async def run_assessment(self, domain: Optional[str] = None, store: bool = True) -> AssessmentReport:
         """
         Run a complete self-assessment.
         
         Args:
             domain: Optional domain to focus on. If None, assesses all domains.
+            store: Record the report in assessment history.
         
         Returns:
             AssessmentReport with scores and recommendations.
         """
-        timestamp = datetime.now().isoformat()
-        
-        # Assess each dimension
-        usefulness = await self._assess_usefulness(domain)
-        coverage = await self._assess_coverage(domain)
-        consistency = await self._assess_consistency(domain)
-        freshness = await self._assess_freshness(domain)
+        timestamp = iso_timestamp(time.time())
+        
+        # Assess each dimension concurrently. Usefulness and consistency share
+        # one feedback-stats lookup, run off the event loop.
+        stats = asyncio.ensure_future(asyncio.to_thread(self._recent_feedback_stats))
+        usefulness, coverage, consistency, freshness = await asyncio.gather(
+            self._assess_usefulness(domain, stats),
+            self._assess_coverage(domain),
+            self._assess_consistency(domain, stats),
+            self._assess_freshness(domain)
+        )
         
         dimension_scores = [usefulness, coverage, consistency, freshness]
         
@@ -142,14 +200,37 @@ class SelfAssessmentEngine:
         )
         
         # Store assessment in history
-        self._store_assessment(report)
+        if store:
+            self._store_assessment(report)
         
         return report
     
-    async def _assess_usefulness(self, domain: Optional[str]) -> DimensionScore:
-        """Assess usefulness based on federated feedback."""
+    async def run_assessment_many(self, domains: List[Optional[str]]) -> List[AssessmentReport]:
+        """
+        Assess several domains and record all reports in one transaction.
+        """
+        reports = await asyncio.gather(
+            *(self.run_assessment(domain, store=False) for domain in domains)
+        )
+        self._store_assessments(reports)
+        return list(reports)
+    
+    async def _feedback_stats(self, stats_future: Optional[Awaitable[FeedbackStats]]) -> FeedbackStats:
+        """30-day feedback stats, from the shared lookup when run_assessment started one."""
+        if stats_future is not None:
+            return await stats_future
+        return await asyncio.to_thread(self._recent_feedback_stats)
+    
+    def _recent_feedback_stats(self) -> FeedbackStats:
+        """30-day feedback stats, skipping the aggregate query when there is no feedback."""
         aggregator = get_feedback_aggregator()
-        stats = aggregator.get_overall_stats(days=30)
+        if not aggregator.has_recent_feedback(30):
+            return FeedbackStats(total_feedback=0, avg_rating=0.0, useful_rate=0.0, correction_rate=0.0)
+        return aggregator.get_overall_stats(30)
+    
+    async def _assess_usefulness(self, domain: Optional[str], stats_future: Optional[Awaitable[FeedbackStats]] = None) -> DimensionScore:
+        """Assess usefulness based on federated feedback."""
+        stats = await self._feedback_stats(stats_future)
         
         recommendations = []
         
@@ -184,9 +265,11 @@ class SelfAssessmentEngine:
         recommendations = []
         
         try:
-            # Get stats from providers
-            vector_stats = await self.vector_provider.get_stats() if self.vector_provider else {}
-            graph_stats = await self.graph_provider.get_stats() if self.graph_provider else {}
+            # Get stats from providers concurrently
+            vector_stats, graph_stats = await asyncio.gather(
+                self.vector_provider.get_stats() if self.vector_provider else _empty_stats(),
+                self.graph_provider.get_stats() if self.graph_provider else _empty_stats()
+            )
             
             chunk_count = vector_stats.get("vector_chunks", 0)
             node_count = graph_stats.get("graph_nodes", 0)
@@ -223,7 +306,7 @@ class SelfAssessmentEngine:
             recommendations=recommendations
         )
     
-    async def _assess_consistency(self, domain: Optional[str]) -> DimensionScore:
+    async def _assess_consistency(self, domain: Optional[str], stats_future: Optional[Awaitable[FeedbackStats]] = None) -> DimensionScore:
         """
         Assess internal consistency of knowledge.
         
@@ -235,8 +318,7 @@ class SelfAssessmentEngine:
         recommendations = []
         
         # For now, use a heuristic based on feedback corrections
-        aggregator = get_feedback_aggregator()
-        stats = aggregator.get_overall_stats(days=30)
+        stats = await self._feedback_stats(stats_future)
         
         if stats.total_feedback == 0:
             score = 0.8  # Assume consistent when no data
@@ -269,30 +351,19 @@ class SelfAssessmentEngine:
         
         if self.kep_handler:
             # Check recent exchange activity as proxy for freshness
-            recent_exchanges = self.kep_handler.get_exchange_history(limit=100)
+            recent_count, total = await asyncio.to_thread(
+                self.kep_handler.get_recent_exchange_counts, 7 * 24 * 3600
+            )
             
-            if not recent_exchanges:
+            if not total:
                 score = 0.5
                 details = "No recent knowledge exchanges"
                 recommendations.append("Knowledge base may be stale - consider updating documents")
             else:
-                # Check how recent the exchanges are
-                now = time.time()
-                recent_count = 0
-                for ex in recent_exchanges:
-                    # Parse timestamp
-                    try:
-                        ex_time = datetime.fromisoformat(ex["timestamp"]).timestamp()
-                        age_days = (now - ex_time) / (24 * 3600)
-                        if age_days < 7:
-                            recent_count += 1
-                    except:
-                        pass
-                
-                recent_ratio = recent_count / len(recent_exchanges) if recent_exchanges else 0
+                recent_ratio = recent_count / total
                 score = 0.5 + (recent_ratio * 0.5)  # 0.5 to 1.0
                 
-                details = f"{recent_count}/{len(recent_exchanges)} exchanges in last 7 days"
+                details = f"{recent_count}/{total} exchanges in last 7 days"
                 
                 if recent_ratio < 0.3:
                     recommendations.append("Low recent activity - consider promoting knowledge exchange")
@@ -309,76 +380,65 @@ class SelfAssessmentEngine:
     
     def _store_assessment(self, report: AssessmentReport):
         """Store assessment in history database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO assessments 
-            (timestamp, domain, overall_score, dimensions, recommendations)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            time.time(),
-            report.domain,
-            report.overall_score,
-            json.dumps(report.dimensions),
-            json.dumps(report.recommendations)
-        ))
+        self._store_assessments([report])
+    
+    def _store_assessments(self, reports: List[AssessmentReport]):
+        """Store a batch of assessments in a single transaction."""
+        now = time.time()
+        rows = [
+            (
+                now,
+                report.domain,
+                report.overall_score,
+                *(report.dimensions.get(name) for name in DIMENSION_COLUMNS),
+                orjson.dumps(report.recommendations).decode()
+            )
+            for report in reports
+        ]
         
-        conn.commit()
-        conn.close()
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(INSERT_ASSESSMENT_SQL, rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
     
-    def get_assessment_history(self, limit: int = 20) -> List[Dict]:
-        """Get history of past assessments."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+    def get_assessment_history(self, limit: int = 20) -> Iterator[Dict]:
+        """Get history of past assessments, newest first, one row at a time."""
+        conn = self._conn()
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
         
-        cursor.execute(
-            "SELECT * FROM assessments ORDER BY timestamp DESC LIMIT ?",
-            (limit,)
-        )
-        rows = cursor.fetchall()
-        conn.close()
+        cursor.execute(ASSESSMENT_HISTORY_SQL, (limit,))
         
-        return [
-            {
+        for row in _iter_rows(cursor):
+            yield {
                 "id": row["id"],
-                "timestamp": datetime.fromtimestamp(row["timestamp"]).isoformat(),
+                "timestamp": iso_timestamp(row["timestamp"]),
                 "domain": row["domain"],
                 "overall_score": row["overall_score"],
-                "dimensions": json.loads(row["dimensions"]) if row["dimensions"] else {},
-                "recommendations": json.loads(row["recommendations"]) if row["recommendations"] else []
+                "dimensions": {name: row[name] for name in DIMENSION_COLUMNS},
+                "recommendations": orjson.loads(row["recommendations"]) if row["recommendations"] else []
             }
-            for row in rows
-        ]
     
-    def get_score_trend(self, days: int = 30) -> List[Dict]:
-        """Get score trend over time."""
+    def get_score_trend(self, days: int = 30) -> Iterator[Dict]:
+        """Get score trend over time, one row at a time."""
         cutoff = time.time() - (days * 24 * 3600)
         
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        conn = self._conn()
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
         
-        cursor.execute("""
-            SELECT timestamp, overall_score, dimensions
-            FROM assessments 
-            WHERE timestamp > ?
-            ORDER BY timestamp ASC
-        """, (cutoff,))
-        
-        rows = cursor.fetchall()
-        conn.close()
+        cursor.execute(SCORE_TREND_SQL, (cutoff,))
         
-        return [
-            {
-                "timestamp": datetime.fromtimestamp(row["timestamp"]).isoformat(),
+        for row in _iter_rows(cursor):
+            yield {
+                "timestamp": iso_timestamp(row["timestamp"]),
                 "overall_score": row["overall_score"],
-                "dimensions": json.loads(row["dimensions"]) if row["dimensions"] else {}
+                "dimensions": {name: row[name] for name in DIMENSION_COLUMNS}
             }
-            for row in rows
-        ]
-
 
 # Global instance
 _assessment_engine = None
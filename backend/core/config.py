@@ -1,7 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 
 class SystemSettings(BaseModel):
+    # Immutable: updates swap in a whole new instance, so readers never see a half-applied change
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     # LLM Settings
     llm_model: str = "gemini-2.0-flash-exp"
     temperature: float = 0.2
@@ -21,3 +24,15 @@ class SystemSettings(BaseModel):
 
 # Global instance (in-memory persistence for now)
 current_settings = SystemSettings()
+
+
+def get_settings() -> SystemSettings:
+    """Get the current system settings."""
+    return current_settings
+
+
+def set_settings(settings: SystemSettings) -> SystemSettings:
+    """Replace the current system settings."""
+    global current_settings
+    current_settings = settings
+    return current_settings
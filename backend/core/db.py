@@ -0,0 +1,56 @@
+"""
+SQLite helpers shared by the feedback and assessment stores (and the
+timestamp format the KEP store uses).
+"""
+
+import math
+import sqlite3
+import threading
+import time
+
+
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def iso_timestamp(ts: float) -> str:
+    """
+    Format a stored epoch timestamp as local ISO-8601.
+    Same output as datetime.fromtimestamp(ts).isoformat(), microseconds included.
+    """
+    # Rounded the way datetime.fromtimestamp rounds
+    fraction, seconds = math.modf(ts)
+    micros = round(fraction * 1e6)
+    if micros >= 1_000_000:
+        seconds += 1
+        micros -= 1_000_000
+    text = time.strftime(ISO_FORMAT, time.localtime(seconds))
+    return f"{text}.{micros:06d}" if micros else text
+
+
+class LocalConnection:
+    """
+    Per-thread SQLite connection, opened once and reused.
+
+    Connections run in autocommit mode with WAL journaling, so each write is
+    its own short transaction unless the caller issues BEGIN/COMMIT.
+    """
+
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA mmap_size=268435456",
+    )
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def __call__(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+        return conn
@@ -6,15 +6,23 @@ This feedback comes from end-users of external agents, allowing DKMES to
 assess real-world knowledge quality.
 """
 
+import atexit
+import logging
 import sqlite3
-import json
+import orjson
+import threading
 import time
-from typing import Optional, List, Dict, Any
+import uuid
+from collections import deque
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 from enum import Enum
 
 from core.kep import KEPFeedback, FeedbackType
+from core.db import LocalConnection, iso_timestamp
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -26,6 +34,61 @@ class FeedbackStats:
     correction_rate: float  # % of feedback with corrections
     
 
+INSERT_FEEDBACK_SQL = """
+    INSERT INTO feedback 
+    (feedback_uid, request_id, sender_agent_id, feedback_type, rating, was_useful, 
+     correction, comments, user_context, domain, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+FEEDBACK_BY_REQUEST_SQL = "SELECT * FROM feedback WHERE request_id = ? ORDER BY timestamp DESC"
+FEEDBACK_BY_AGENT_SQL = "SELECT * FROM feedback WHERE sender_agent_id = ? ORDER BY timestamp DESC LIMIT ?"
+RECENT_FEEDBACK_SQL = "SELECT * FROM feedback ORDER BY timestamp DESC LIMIT ?"
+
+# One pass over the window: count, average rating (AVG skips NULL ratings),
+# useful count and correction count
+OVERALL_STATS_SQL = """
+    SELECT COUNT(*),
+           AVG(rating),
+           SUM(CASE WHEN was_useful = 1 THEN 1 ELSE 0 END),
+           SUM(CASE WHEN correction IS NOT NULL AND correction != '' THEN 1 ELSE 0 END)
+    FROM feedback
+    WHERE timestamp > ?
+"""
+
+HAS_RECENT_FEEDBACK_SQL = "SELECT 1 FROM feedback WHERE timestamp > ? LIMIT 1"
+
+STATS_BY_DOMAIN_SQL = """
+    SELECT COALESCE(domain, 'unknown'), COUNT(*) as cnt, 
+           AVG(rating) as avg_r,
+           SUM(was_useful) as useful_cnt,
+           SUM(CASE WHEN correction IS NOT NULL AND correction != '' THEN 1 ELSE 0 END) as corr_cnt
+    FROM feedback 
+    WHERE timestamp > ?
+    GROUP BY domain
+"""
+
+STATS_BY_AGENT_SQL = """
+    SELECT sender_agent_id, COUNT(*) as cnt, 
+           AVG(rating) as avg_r,
+           SUM(was_useful) as useful_cnt,
+           SUM(CASE WHEN correction IS NOT NULL AND correction != '' THEN 1 ELSE 0 END) as corr_cnt
+    FROM feedback 
+    WHERE timestamp > ?
+    GROUP BY sender_agent_id
+"""
+
+LOW_RATED_REQUESTS_SQL = """
+    SELECT request_id, AVG(rating) as avg_rating, COUNT(*) as feedback_count
+    FROM feedback 
+    WHERE rating IS NOT NULL
+    GROUP BY request_id
+    HAVING AVG(rating) < ?
+    ORDER BY avg_rating ASC
+    LIMIT ?
+"""
+
+
 class FeedbackStore:
     """
     Stores and retrieves feedback from external agents.
@@ -33,13 +96,31 @@ class FeedbackStore:
     Feedback is linked to knowledge exchange requests via request_id.
     """
     
+    FLUSH_INTERVAL = 0.1  # seconds
+    FLUSH_BATCH_SIZE = 500
+    MAX_PENDING = 10_000  # store_feedback writes the backlog itself beyond this
+    MAX_FLUSH_ATTEMPTS = 5  # then the batch is moved to the dead-letter file
+    
     def __init__(self, db_path: str = "feedback.db"):
         self.db_path = db_path
+        self._conn = LocalConnection(db_path)
+        # Write-behind buffer drained by the flusher thread
+        self._pending: deque = deque()
+        self._lock = threading.Lock()
+        # Held from taking a batch until it is committed, so a reader's flush()
+        # waits for one already in progress instead of seeing an empty queue
+        self._flush_lock = threading.Lock()
+        self._failed_flushes = 0
+        self.dead_letter_path = f"{db_path}.failed.jsonl"
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        # Bumped on every flushed batch so cached aggregates know they are stale
+        self._version = 0
         self._init_db()
     
     def _init_db(self):
         """Initialize SQLite database for feedback storage."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._conn()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -53,11 +134,25 @@ class FeedbackStore:
                 correction TEXT,
                 comments TEXT,
                 user_context TEXT,
+                domain TEXT,
                 timestamp REAL,
-                processed INTEGER DEFAULT 0
+                processed INTEGER DEFAULT 0,
+                feedback_uid TEXT
             )
         """)
         
+        # Older databases predate the domain column: add it and backfill from user_context
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(feedback)")}
+        if "feedback_uid" not in columns:
+            cursor.execute("ALTER TABLE feedback ADD COLUMN feedback_uid TEXT")
+        if "domain" not in columns:
+            cursor.execute("ALTER TABLE feedback ADD COLUMN domain TEXT")
+            rows = cursor.execute("SELECT id, user_context FROM feedback").fetchall()
+            cursor.executemany(
+                "UPDATE feedback SET domain = ? WHERE id = ?",
+                [((orjson.loads(ctx) if ctx else {}).get("domain"), row_id) for row_id, ctx in rows]
+            )
+        
         # Index for fast lookups
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_feedback_request 
@@ -67,21 +162,34 @@ class FeedbackStore:
             CREATE INDEX IF NOT EXISTS idx_feedback_agent 
             ON feedback(sender_agent_id)
         """)
-        
-        conn.commit()
-        conn.close()
-    
-    def store_feedback(self, feedback: KEPFeedback) -> int:
-        """Store a piece of feedback. Returns the feedback ID."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        # Time-window aggregates (get_overall_stats) read from this index
         cursor.execute("""
-            INSERT INTO feedback 
-            (request_id, sender_agent_id, feedback_type, rating, was_useful, 
-             correction, comments, user_context, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+            CREATE INDEX IF NOT EXISTS idx_feedback_ts 
+            ON feedback(timestamp, rating, was_useful)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_feedback_domain 
+            ON feedback(domain, timestamp)
+        """)
+        # Rated rows only, ordered by request, for get_low_rated_requests
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_feedback_lowrated 
+            ON feedback(request_id, rating) WHERE rating IS NOT NULL
+        """)
+    
+    def store_feedback(self, feedback: KEPFeedback) -> str:
+        """
+        Queue a piece of feedback for storage and return its feedback_uid.
+        
+        Rows are written in batches by a background flusher (every
+        FLUSH_INTERVAL seconds or FLUSH_BATCH_SIZE rows). Reads flush first,
+        so queued feedback is always visible to them. Once MAX_PENDING rows
+        are queued the caller writes the backlog itself, and gets a
+        RuntimeError if that fails, so no accepted row is ever dropped.
+        """
+        feedback_uid = str(uuid.uuid4())
+        row = (
+            feedback_uid,
             feedback.request_id,
             feedback.sender_agent_id,
             feedback.feedback_type.value,
@@ -89,58 +197,107 @@ class FeedbackStore:
             1 if feedback.was_useful else 0,
             feedback.correction,
             feedback.comments,
-            json.dumps(feedback.user_context),
+            orjson.dumps(feedback.user_context).decode(),
+            feedback.user_context.get("domain"),
             time.time()
-        ))
-        
-        feedback_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        return feedback_id
+        )
+        if len(self._pending) >= self.MAX_PENDING:
+            self.flush()
+            if len(self._pending) >= self.MAX_PENDING:
+                raise RuntimeError("Feedback backlog is full")
+        
+        with self._lock:
+            self._pending.append(row)
+            pending = len(self._pending)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="feedback-flusher", daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+        
+        if pending >= self.FLUSH_BATCH_SIZE:
+            self._wake.set()
+        return feedback_uid
+    
+    def flush(self):
+        """
+        Write all queued feedback in a single transaction.
+        
+        A failed batch is re-queued; after MAX_FLUSH_ATTEMPTS failures in a row it
+        is appended to the dead-letter file instead, so one bad row can't block
+        later feedback.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+                self._pending.clear()
+            if not batch:
+                return
+            
+            conn = self._conn()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(INSERT_FEEDBACK_SQL, batch)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                self._failed_flushes += 1
+                if self._failed_flushes < self.MAX_FLUSH_ATTEMPTS:
+                    logger.exception("Feedback flush failed, batch re-queued")
+                    with self._lock:
+                        # Ahead of anything queued meanwhile, so rows keep their order
+                        self._pending.extendleft(reversed(batch))
+                else:
+                    logger.exception("Feedback flush failed %d times, moving %d rows to %s",
+                                     self._failed_flushes, len(batch), self.dead_letter_path)
+                    self._failed_flushes = 0
+                    with open(self.dead_letter_path, "ab") as f:
+                        f.writelines(orjson.dumps(row) + b"\n" for row in batch)
+                return
+            self._failed_flushes = 0
+            self._version += 1
+    
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.FLUSH_INTERVAL)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Feedback flush failed")
     
     def get_feedback_for_request(self, request_id: str) -> List[Dict]:
         """Get all feedback for a specific knowledge exchange request."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        self.flush()
+        conn = self._conn()
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
         
-        cursor.execute(
-            "SELECT * FROM feedback WHERE request_id = ? ORDER BY timestamp DESC",
-            (request_id,)
-        )
+        cursor.execute(FEEDBACK_BY_REQUEST_SQL, (request_id,))
         rows = cursor.fetchall()
-        conn.close()
         
         return [self._row_to_dict(row) for row in rows]
     
     def get_feedback_for_agent(self, agent_id: str, limit: int = 100) -> List[Dict]:
         """Get feedback from a specific agent."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        self.flush()
+        conn = self._conn()
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
         
-        cursor.execute(
-            "SELECT * FROM feedback WHERE sender_agent_id = ? ORDER BY timestamp DESC LIMIT ?",
-            (agent_id, limit)
-        )
+        cursor.execute(FEEDBACK_BY_AGENT_SQL, (agent_id, limit))
         rows = cursor.fetchall()
-        conn.close()
         
         return [self._row_to_dict(row) for row in rows]
     
     def get_recent_feedback(self, limit: int = 50) -> List[Dict]:
         """Get recent feedback across all agents."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        self.flush()
+        conn = self._conn()
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
         
-        cursor.execute(
-            "SELECT * FROM feedback ORDER BY timestamp DESC LIMIT ?",
-            (limit,)
-        )
+        cursor.execute(RECENT_FEEDBACK_SQL, (limit,))
         rows = cursor.fetchall()
-        conn.close()
         
         return [self._row_to_dict(row) for row in rows]
     
@@ -148,6 +305,7 @@ class FeedbackStore:
         """Convert a database row to a dictionary."""
         return {
             "id": row["id"],
+            "feedback_uid": row["feedback_uid"],
             "request_id": row["request_id"],
             "sender_agent_id": row["sender_agent_id"],
             "feedback_type": row["feedback_type"],
@@ -155,8 +313,8 @@ class FeedbackStore:
             "was_useful": bool(row["was_useful"]),
             "correction": row["correction"],
             "comments": row["comments"],
-            "user_context": json.loads(row["user_context"]) if row["user_context"] else {},
-            "timestamp": datetime.fromtimestamp(row["timestamp"]).isoformat()
+            "user_context": orjson.loads(row["user_context"]) if row["user_context"] else {},
+            "timestamp": iso_timestamp(row["timestamp"])
         }
 
 
@@ -167,54 +325,53 @@ class FeedbackAggregator:
     Used by the Self-Assessment Engine to evaluate knowledge quality.
     """
     
+    STATS_CACHE_TTL = 30.0  # seconds
+    
     def __init__(self, feedback_store: FeedbackStore):
         self.store = feedback_store
+        # days -> (computed_at, store version, stats)
+        self._stats_cache: Dict[int, Tuple[float, int, FeedbackStats]] = {}
+    
+    def has_recent_feedback(self, days: int = 30) -> bool:
+        """Check whether any feedback arrived in the past N days."""
+        self.store.flush()
+        cutoff = time.time() - (days * 24 * 3600)
+        return self.store._conn().execute(HAS_RECENT_FEEDBACK_SQL, (cutoff,)).fetchone() is not None
     
     def get_overall_stats(self, days: int = 30) -> FeedbackStats:
-        """Get overall feedback statistics for the past N days."""
+        """
+        Get overall feedback statistics for the past N days.
+        
+        Results are cached per `days` for STATS_CACHE_TTL seconds, or until new
+        feedback is written, so one assessment run computes them only once.
+        """
+        self.store.flush()
+        now = time.time()
+        cached = self._stats_cache.get(days)
+        if cached and now - cached[0] < self.STATS_CACHE_TTL and cached[1] == self.store._version:
+            return cached[2]
+        
+        stats = self._compute_overall_stats(days)
+        self._stats_cache[days] = (now, self.store._version, stats)
+        return stats
+    
+    def _compute_overall_stats(self, days: int) -> FeedbackStats:
         cutoff = time.time() - (days * 24 * 3600)
         
-        conn = sqlite3.connect(self.store.db_path)
+        conn = self.store._conn()
         cursor = conn.cursor()
         
-        # Get total count
-        cursor.execute(
-            "SELECT COUNT(*) FROM feedback WHERE timestamp > ?",
-            (cutoff,)
-        )
-        total = cursor.fetchone()[0]
+        cursor.execute(OVERALL_STATS_SQL, (cutoff,))
+        total, avg_rating, useful_count, correction_count = cursor.fetchone()
         
         if total == 0:
-            conn.close()
             return FeedbackStats(
                 total_feedback=0,
                 avg_rating=0.0,
                 useful_rate=0.0,
                 correction_rate=0.0
             )
-        
-        # Get average rating (only for feedback with ratings)
-        cursor.execute(
-            "SELECT AVG(rating) FROM feedback WHERE timestamp > ? AND rating IS NOT NULL",
-            (cutoff,)
-        )
-        avg_rating = cursor.fetchone()[0] or 0.0
-        
-        # Get useful rate
-        cursor.execute(
-            "SELECT COUNT(*) FROM feedback WHERE timestamp > ? AND was_useful = 1",
-            (cutoff,)
-        )
-        useful_count = cursor.fetchone()[0]
-        
-        # Get correction rate
-        cursor.execute(
-            "SELECT COUNT(*) FROM feedback WHERE timestamp > ? AND correction IS NOT NULL AND correction != ''",
-            (cutoff,)
-        )
-        correction_count = cursor.fetchone()[0]
-        
-        conn.close()
+        avg_rating = avg_rating or 0.0
         
         return FeedbackStats(
             total_feedback=total,
@@ -225,60 +382,41 @@ class FeedbackAggregator:
     
     def get_stats_by_domain(self, domain: str = None, days: int = 30) -> Dict[str, FeedbackStats]:
         """Get feedback statistics grouped by domain."""
+        self.store.flush()
         cutoff = time.time() - (days * 24 * 3600)
         
-        conn = sqlite3.connect(self.store.db_path)
+        conn = self.store._conn()
         cursor = conn.cursor()
         
-        # Join with exchanges to get domain info
-        # Note: This requires the kep.db to be accessible
-        # For now, we'll use user_context which may contain domain
-        
-        cursor.execute("""
-            SELECT user_context, COUNT(*) as cnt, 
-                   AVG(rating) as avg_r,
-                   SUM(was_useful) as useful_cnt
-            FROM feedback 
-            WHERE timestamp > ?
-            GROUP BY user_context
-        """, (cutoff,))
+        cursor.execute(STATS_BY_DOMAIN_SQL, (cutoff,))
         
         rows = cursor.fetchall()
-        conn.close()
         
         result = {}
         for row in rows:
-            ctx = json.loads(row[0]) if row[0] else {}
-            domain_name = ctx.get("domain", "unknown")
+            domain_name = row[0]
+            total = row[1]
             
             result[domain_name] = FeedbackStats(
-                total_feedback=row[1],
+                total_feedback=total,
                 avg_rating=round(row[2] or 0, 2),
-                useful_rate=round((row[3] or 0) / row[1] * 100, 1),
-                correction_rate=0.0  # Would need separate query
+                useful_rate=round((row[3] or 0) / total * 100, 1),
+                correction_rate=round((row[4] or 0) / total * 100, 1)
             )
         
         return result
     
     def get_stats_by_agent(self, days: int = 30) -> Dict[str, FeedbackStats]:
         """Get feedback statistics grouped by sender agent."""
+        self.store.flush()
         cutoff = time.time() - (days * 24 * 3600)
         
-        conn = sqlite3.connect(self.store.db_path)
+        conn = self.store._conn()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT sender_agent_id, COUNT(*) as cnt, 
-                   AVG(rating) as avg_r,
-                   SUM(was_useful) as useful_cnt,
-                   SUM(CASE WHEN correction IS NOT NULL AND correction != '' THEN 1 ELSE 0 END) as corr_cnt
-            FROM feedback 
-            WHERE timestamp > ?
-            GROUP BY sender_agent_id
-        """, (cutoff,))
+        cursor.execute(STATS_BY_AGENT_SQL, (cutoff,))
         
         rows = cursor.fetchall()
-        conn.close()
         
         result = {}
         for row in rows:
@@ -296,22 +434,14 @@ class FeedbackAggregator:
     
     def get_low_rated_requests(self, threshold: float = 2.5, limit: int = 10) -> List[Dict]:
         """Get requests that received low ratings - candidates for improvement."""
-        conn = sqlite3.connect(self.store.db_path)
-        conn.row_factory = sqlite3.Row
+        self.store.flush()
+        conn = self.store._conn()
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
         
-        cursor.execute("""
-            SELECT request_id, AVG(rating) as avg_rating, COUNT(*) as feedback_count
-            FROM feedback 
-            WHERE rating IS NOT NULL
-            GROUP BY request_id
-            HAVING AVG(rating) < ?
-            ORDER BY avg_rating ASC
-            LIMIT ?
-        """, (threshold, limit))
+        cursor.execute(LOW_RATED_REQUESTS_SQL, (threshold, limit))
         
         rows = cursor.fetchall()
-        conn.close()
         
         return [
             {
@@ -2,23 +2,101 @@ import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold, GenerationConfig
 from core.tools import get_tool_registry, ToolResult
 import os
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple, AsyncIterator
 import asyncio
+import time
 
-import json
+import re
 import hashlib
-from core.config import current_settings
+from collections import OrderedDict
+import orjson
+import xxhash
+from core.config import get_settings
 from core.prompt_manager import PromptManager
+from core.semantic_cache import SemanticAnswerCache
+
+# Seconds a prewarmed connection is assumed to stay open
+PREWARM_INTERVAL = 60.0
+
+# Responses kept in memory; the least recently used are evicted beyond this
+CACHE_MAX_ENTRIES = 10_000
+# Appends between checks of whether the cache log needs compacting
+CACHE_COMPACT_CHECK_EVERY = 100
+# Seconds the cache writer waits for more entries before writing a batch
+CACHE_FLUSH_INTERVAL = 0.1
+# Semantic cache: only deterministic calls that opt in with a semantic_key (the variable
+# fields of a templated prompt, never the template itself), and only keys short enough
+# that the embedding model (256-token window) sees all of them
+SEMANTIC_CACHE_MAX_TEMPERATURE = 0.01
+SEMANTIC_CACHE_MAX_CHARS = 1000
+SEMANTIC_CACHE_MIN_SIMILARITY = 0.92
+# Answer-generation context budget in characters (approx 8000 chars ~ 2000 tokens).
+# Gemini's tokenizer is only reachable through the count_tokens API, a network
+# round trip per call, so the budget stays character-based.
+MAX_ANSWER_CONTEXT_CHARS = 8000
+# Returned by generate_answer when Gemini fails; callers must not cache it
+ANSWER_FAILED = "Failed to generate answer."
+# Concurrent generate calls per client, to stay inside the Gemini QPS quota
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+
+_WORD_RE = re.compile(r"[A-Za-z0-9]+(?:[-'.][A-Za-z0-9]+)*")
+_STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she should
+so some such than that the their theirs them themselves then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would you
+your yours yourself yourselves tell explain describe show give list find please know
+""".split())
+
+
+def _local_keywords(query: str) -> List[str]:
+    """Content words of an English query, in order, without duplicates."""
+    seen = set()
+    keywords = []
+    for word in _WORD_RE.findall(query):
+        lowered = word.lower()
+        if len(word) > 1 and lowered not in _STOPWORDS and lowered not in seen:
+            seen.add(lowered)
+            keywords.append(word)
+    return keywords
+
 
 class GeminiClient:
+    # Judge instructions for evaluate_rag_context, by persona
+    PERSONA_INSTRUCTIONS = {
+        "Novice": "You are a helpful teacher explaining to a beginner. Focus on clarity and simplicity.",
+        "Intermediate": "You are a knowledgeable peer. Focus on accuracy and providing relevant details.",
+        "Expert": "You are a domain expert. Focus on technical depth, precision, and comprehensive coverage."
+    }
+
     def __init__(self, project_id: str = None, location: str = "us-central1", model_name: str = None):
         self.project_id = project_id
         self.location = location
-        self.model_name = model_name or current_settings.llm_model
+        self.model_name = model_name or get_settings().llm_model
         self.api_key = os.getenv("GEMINI_API_KEY")
-        self.cache_file = ".gemini_cache.json"
-        self.cache = self._load_cache()
+        self.cache_file = ".gemini_cache.jsonl"
+        self._cache_lines = 0
+        self._appends_since_check = 0
+        self.cache: "OrderedDict[str, str]" = self._load_cache()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        # cache_key -> result of the generate call currently in flight for it
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # One GenerationConfig per temperature in use, built on first use
+        self._gen_configs: Dict[float, GenerationConfig] = {}
+        # Started on first cache miss, once an event loop is running
+        self._cache_queue: Optional[asyncio.Queue] = None
+        self._cache_writer: Optional[asyncio.Task] = None
+        # Near-duplicate prompt lookup; enabled once an embedding function is set
+        # (e.g. VectorProvider.embedding_fn, which returns normalized vectors).
+        # One cache per prompt template, so keys only ever compare like with like.
+        self.embedding_fn = None
+        self.semantic_caches: Dict[str, SemanticAnswerCache] = {}
         self.prompt_manager = PromptManager()
+        self._last_warm = 0.0
+        self._generate_slots = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
         
         try:
             if not self.api_key:
@@ -38,65 +116,269 @@ class GeminiClient:
         """
         Generates a final answer based on the query and retrieved context.
         """
-        # Truncate context to avoid hitting token limits (approx 8000 chars ~ 2000 tokens)
-        MAX_CONTEXT_LEN = 8000
-        if len(context) > MAX_CONTEXT_LEN:
-            context = context[:MAX_CONTEXT_LEN] + "...(truncated)"
+        prompt = self._build_answer_prompt(query, context)
+        try:
+            return await self.generate_content(prompt, temperature=get_settings().temperature)
+        except Exception as e:
+            print(f"Answer generation failed: {e}")
+            return ANSWER_FAILED
+
+    async def stream_answer(self, query: str, context: str) -> AsyncIterator[str]:
+        """
+        Same as generate_answer, but yields the answer text as Gemini produces it.
+        """
+        prompt = self._build_answer_prompt(query, context)
+        temperature = get_settings().temperature
+        
+        if self.is_mock:
+            yield "Mock response from Gemini"
+            return
+        
+        cache_key = self._get_cache_key(prompt, temperature)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        try:
+            config = self._generation_config(temperature)
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=config,
+                stream=True
+            )
+            
+            parts = []
+            async for chunk in response:
+                parts.append(chunk.text)
+                yield chunk.text
+            
+            # Update Cache with the full answer
+            self._cache_put(cache_key, "".join(parts))
+        except Exception as e:
+            print(f"Answer streaming failed: {e}")
+            yield "Failed to generate answer."
 
-        prompt = self.prompt_manager.get_template("answer_generation").format(
+    def _build_answer_prompt(self, query: str, context: str) -> str:
+        # Truncate context to avoid hitting token limits
+        if len(context) > MAX_ANSWER_CONTEXT_CHARS:
+            context = context[:MAX_ANSWER_CONTEXT_CHARS] + "...(truncated)"
+
+        return self.prompt_manager.get_template("answer_generation").format(
             context=context,
             query=query
         )
+
+    async def prewarm(self):
+        """
+        Opens the connection to the Gemini API ahead of a generate call.
+        Meant to run alongside retrieval; does nothing if the client was used recently.
+        """
+        if self.is_mock or time.time() - self._last_warm < PREWARM_INTERVAL:
+            return
+        self._last_warm = time.time()
         try:
-            return await self.generate_content(prompt, temperature=current_settings.temperature)
+            await self.model.count_tokens_async("ping")
         except Exception as e:
-            print(f"Answer generation failed: {e}")
-            return "Failed to generate answer."
+            print(f"Gemini prewarm failed: {e}")
 
-    def _load_cache(self) -> dict:
+    def _load_cache(self) -> "OrderedDict[str, str]":
+        """Replay the append-only cache log; later lines win and count as more recent."""
+        cache = OrderedDict()
         if os.path.exists(self.cache_file):
             try:
-                with open(self.cache_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
+                with open(self.cache_file, 'rb') as f:
+                    for line in f:
+                        self._cache_lines += 1
+                        try:
+                            entry = orjson.loads(line)
+                            cache[entry["k"]] = entry["v"]
+                        except (ValueError, KeyError):
+                            continue  # e.g. a line cut short by a crash
+                        cache.move_to_end(entry["k"])
+                        if len(cache) > CACHE_MAX_ENTRIES:
+                            cache.popitem(last=False)
+            except OSError:
+                return OrderedDict()
+        return cache
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        value = self.cache.get(key)
+        if value is None:
+            self._cache_misses += 1
+            return None
+        self.cache.move_to_end(key)
+        self._cache_hits += 1
+        return value
+
+    def _cache_put(self, key: str, value: str):
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+        if len(self.cache) > CACHE_MAX_ENTRIES:
+            self.cache.popitem(last=False)
+        self._queue_cache_write(key, value)
+
+    @property
+    def cache_stats(self) -> Dict[str, int]:
+        """Response cache size and hit counts since startup."""
+        return {
+            "entries": len(self.cache),
+            "max_entries": CACHE_MAX_ENTRIES,
+            "hits": self._cache_hits,
+            "misses": self._cache_misses
+        }
 
-    def _save_cache(self):
+    def _queue_cache_write(self, key: str, value: str):
+        """Hand a new cache entry to the background writer."""
+        if self._cache_queue is None:
+            self._cache_queue = asyncio.Queue()
+            self._cache_writer = asyncio.create_task(self._cache_writer_loop())
+        self._cache_queue.put_nowait((key, value))
+
+    async def _cache_writer_loop(self):
+        while True:
+            batch = [await self._cache_queue.get()]
+            # Let concurrent misses coalesce into one append
+            await asyncio.sleep(CACHE_FLUSH_INTERVAL)
+            while not self._cache_queue.empty():
+                batch.append(self._cache_queue.get_nowait())
+            
+            entries = [entry for entry in batch if entry is not None]
+            if entries:
+                await asyncio.to_thread(self._append_cache, entries)
+            if None in batch:  # flush_cache asked us to stop
+                return
+
+    async def flush_cache(self):
+        """Persist anything still queued and stop the background writer."""
+        if self._cache_writer is None:
+            return
+        self._cache_queue.put_nowait(None)
+        await self._cache_writer
+        self._cache_queue = None
+        self._cache_writer = None
+
+    def _append_cache(self, entries: List[tuple]):
+        """Persist cache entries by appending them to the log."""
         try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.cache, f)
+            with open(self.cache_file, 'ab') as f:
+                f.writelines(orjson.dumps({"k": key, "v": value}) + b"\n" for key, value in entries)
         except Exception as e:
             print(f"Failed to save cache: {e}")
+            return
+        
+        self._cache_lines += len(entries)
+        self._appends_since_check += len(entries)
+        if self._appends_since_check >= CACHE_COMPACT_CHECK_EVERY:
+            self._appends_since_check = 0
+            if self._cache_lines > 2 * len(self.cache):
+                self._compact_cache()
+
+    def _compact_cache(self):
+        """Rewrite the log with one line per live key."""
+        tmp_file = self.cache_file + ".tmp"
+        try:
+            # Snapshot first: the event loop may add entries meanwhile
+            entries = list(self.cache.items())
+            with open(tmp_file, 'wb') as f:
+                f.writelines(orjson.dumps({"k": key, "v": value}) + b"\n" for key, value in entries)
+            os.replace(tmp_file, self.cache_file)
+            self._cache_lines = len(entries)
+        except Exception as e:
+            print(f"Failed to compact cache: {e}")
+
+    def _generation_config(self, temperature: float) -> GenerationConfig:
+        config = self._gen_configs.get(temperature)
+        if config is None:
+            config = self._gen_configs[temperature] = GenerationConfig(temperature=temperature)
+        return config
 
     def _get_cache_key(self, prompt: str, temperature: float) -> str:
-        return hashlib.md5(f"{prompt}::{temperature}::{self.model_name}".encode()).hexdigest()
+        h = xxhash.xxh3_128(prompt.encode())
+        h.update(f"::{temperature}::{self.model_name}".encode())
+        return h.hexdigest()
 
     def _init_vertex(self):
         # Deprecated: Vertex AI init
         pass
 
-    async def generate_content(self, prompt: str, temperature: float = 0.0) -> str:
+    async def generate_content(self, prompt: str, temperature: float = 0.0,
+                               semantic_key: Optional[Tuple[str, str]] = None) -> str:
+        """
+        Generates text for a prompt, answering from the response caches when possible.
+        
+        semantic_key is an optional (template, variable fields) pair. When given, a
+        deterministic call may reuse the answer of an earlier call with the same
+        template whose variable fields embed as near-identical. Callers should only
+        pass it where such reuse is harmless.
+        """
         if self.is_mock:
             await asyncio.sleep(1) # Simulate latency
             return "Mock response from Gemini"
             
         # Check Cache
         cache_key = self._get_cache_key(prompt, temperature)
-        if cache_key in self.cache:
+        cached = self._cache_get(cache_key)
+        if cached is not None:
             print("Cache Hit! Returning cached response.")
-            return self.cache[cache_key]
+            return cached
+        
+        # Identical prompt already being generated: share its result
+        pending = self._in_flight.get(cache_key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        
+        result = asyncio.get_running_loop().create_future()
+        self._in_flight[cache_key] = result
+        try:
+            text = await self._generate_uncached(prompt, temperature, cache_key, semantic_key)
+            result.set_result(text)
+            return text
+        except Exception as e:
+            result.set_exception(e)
+            result.exception()  # retrieved here, so no "never retrieved" warning without waiters
+            raise
+        finally:
+            if not result.done():  # we were cancelled; don't leave waiters hanging
+                result.cancel()
+            del self._in_flight[cache_key]
+
+    async def _generate_uncached(self, prompt: str, temperature: float, cache_key: str,
+                                 semantic_key: Optional[Tuple[str, str]] = None) -> str:
+        # Then a near-identical earlier call with the same template
+        embedding = None
+        semantic_cache = None
+        if (semantic_key is not None
+                and self.embedding_fn is not None
+                and temperature < SEMANTIC_CACHE_MAX_TEMPERATURE
+                and len(semantic_key[1]) <= SEMANTIC_CACHE_MAX_CHARS):
+            template, fields = semantic_key
+            semantic_cache = self.semantic_caches.get(template)
+            if semantic_cache is None:
+                semantic_cache = self.semantic_caches[template] = SemanticAnswerCache(
+                    max_distance=1.0 - SEMANTIC_CACHE_MIN_SIMILARITY,
+                    ttl_seconds=3600.0
+                )
+            embedding = (await asyncio.to_thread(self.embedding_fn, [fields]))[0]
+            cached = semantic_cache.get(embedding)
+            if cached is not None:
+                print("Semantic Cache Hit! Returning cached response.")
+                return cached
 
         try:
-            config = GenerationConfig(temperature=temperature)
-            response = await self.model.generate_content_async(
-                prompt,
-                generation_config=config
-            )
+            config = self._generation_config(temperature)
+            async with self._generate_slots:
+                response = await self.model.generate_content_async(
+                    prompt,
+                    generation_config=config
+                )
+            
+            self._last_warm = time.time()
             
             # Update Cache
-            self.cache[cache_key] = response.text
-            self._save_cache()
+            self._cache_put(cache_key, response.text)
+            if embedding is not None:
+                semantic_cache.put(embedding, response.text)
             
             return response.text
         except Exception as e:
@@ -117,8 +399,7 @@ class GeminiClient:
         await asyncio.sleep(1)
         
         # Generate deterministic but unique nodes based on text content hash or length
-        import hashlib
-        text_hash = hashlib.md5(text.encode()).hexdigest()[:6]
+        text_hash = hashlib.blake2b(text.encode(), digest_size=3).hexdigest()
         
         # Create a "Document" node and some "Entity" nodes based on words in the text
         # This ensures that different files create different nodes.
@@ -127,7 +408,7 @@ class GeminiClient:
         
         # Extract some pseudo-entities (just capitalized words or long words)
         words = [w for w in text.split() if len(w) > 5 and w.isalnum()]
-        entities = list(set(words))[:3] # Take top 3 unique "entities"
+        entities = list(dict.fromkeys(words))[:3] # Take first 3 unique "entities", in text order
         
         cypher_queries = []
         cypher_queries.append(f"MERGE (d:Document {{name: '{doc_node_name}', hash: '{text_hash}'}})")
@@ -151,13 +432,7 @@ class GeminiClient:
         """
         context_str = "\n".join([f"- {item}" for item in context])
         
-        persona_instructions = {
-            "Novice": "You are a helpful teacher explaining to a beginner. Focus on clarity and simplicity.",
-            "Intermediate": "You are a knowledgeable peer. Focus on accuracy and providing relevant details.",
-            "Expert": "You are a domain expert. Focus on technical depth, precision, and comprehensive coverage."
-        }
-        
-        instruction = persona_instructions.get(persona, persona_instructions["Novice"])
+        instruction = self.PERSONA_INSTRUCTIONS.get(persona, self.PERSONA_INSTRUCTIONS["Novice"])
         
         full_prompt = self.prompt_manager.get_template("rag_evaluation").format(
             instruction=instruction,
@@ -185,6 +460,13 @@ class GeminiClient:
         """
         Extracts key entities/keywords from a natural language query for Graph search.
         """
+        # English queries: a stopword filter is enough for graph name matching,
+        # no LLM round trip. Other languages (e.g. Korean particles) still go to the LLM.
+        if query.isascii():
+            keywords = _local_keywords(query)
+            if keywords:
+                return keywords
+
         if self.is_mock:
             return query.split() # Fallback
 
@@ -205,12 +487,15 @@ class GeminiClient:
         Calculates Faithfulness: Is the answer derived from the context?
         """
         context_str = "\n".join(context)
-        prompt = self.prompt_manager.get_template("metric_faithfulness").format(
+        template = self.prompt_manager.get_template("metric_faithfulness")
+        prompt = template.format(
             context_str=context_str,
             answer=answer
         )
         try:
-            response = await self.generate_content(prompt, temperature=0.0)
+            response = await self.generate_content(
+                prompt, temperature=0.0, semantic_key=(template, f"{context_str}\n{answer}")
+            )
             return float(response.strip())
         except:
             return 0.5
@@ -219,12 +504,15 @@ class GeminiClient:
         """
         Calculates Answer Relevance: Is the answer relevant to the question?
         """
-        prompt = self.prompt_manager.get_template("metric_relevance").format(
+        template = self.prompt_manager.get_template("metric_relevance")
+        prompt = template.format(
             question=question,
             answer=answer
         )
         try:
-            response = await self.generate_content(prompt, temperature=0.0)
+            response = await self.generate_content(
+                prompt, temperature=0.0, semantic_key=(template, f"{question}\n{answer}")
+            )
             return float(response.strip())
         except:
             return 0.5
@@ -237,16 +525,36 @@ class GeminiClient:
             return 0.0
             
         context_str = "\n".join(context)
-        prompt = self.prompt_manager.get_template("metric_recall").format(
+        template = self.prompt_manager.get_template("metric_recall")
+        prompt = template.format(
             ground_truth=ground_truth,
             context_str=context_str
         )
         try:
-            response = await self.generate_content(prompt, temperature=0.0)
+            response = await self.generate_content(
+                prompt, temperature=0.0, semantic_key=(template, f"{ground_truth}\n{context_str}")
+            )
             return float(response.strip())
         except:
             return 0.5
 
+    async def calculate_all_metrics(self, question: str, answer: str, context: List[str], ground_truth: Optional[str] = None) -> Dict[str, float]:
+        """
+        Runs the faithfulness, relevance and (with a ground truth) recall metrics concurrently.
+        """
+        metrics = [
+            self.calculate_faithfulness(question, answer, context),
+            self.calculate_answer_relevance(question, answer)
+        ]
+        if ground_truth:
+            metrics.append(self.calculate_context_recall(question, context, ground_truth))
+        
+        scores = await asyncio.gather(*metrics)
+        result = {"faithfulness": scores[0], "answer_relevance": scores[1]}
+        if ground_truth:
+            result["context_recall"] = scores[2]
+        return result
+
 
 # ============================================================================
 # Agentic AI: Function Calling Support
@@ -255,6 +563,20 @@ class GeminiClient:
 from dataclasses import dataclass, field
 from typing import Dict, Any
 
+# Placeholder rendered into the agent system prompt where the context goes
+AGENT_CONTEXT_SLOT = "\x00"
+
+# Body of the first ```json fence, else of the first plain ``` fence (closing fence optional)
+_JSON_FENCE_RE = re.compile(r"```json(.*?)(?:```|$)", re.DOTALL)
+_FENCE_RE = re.compile(r"```(.*?)(?:```|$)", re.DOTALL)
+
+
+def _tool_call_payload(response: str) -> str:
+    """The part of a model response that should hold a tool-call JSON object."""
+    match = _JSON_FENCE_RE.search(response) or _FENCE_RE.search(response)
+    return (match.group(1) if match else response).strip()
+
+
 @dataclass
 class ToolCall:
     """Represents a tool call made by the agent."""
@@ -282,6 +604,28 @@ class AgenticGeminiClient(GeminiClient):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.max_tool_iterations = 8  # Prevent infinite loops
+        # (template, tools schema, rendered pieces) of the last agent system prompt
+        self._agent_prompt: Optional[tuple] = None
+    
+    def _agent_prompt_pieces(self, template: str, tools_schema: List[Dict[str, Any]]) -> List[str]:
+        """
+        Render the agent system prompt once per template/tool set, split around
+        the context slot, so each loop iteration only has to join in the context.
+        """
+        cached = self._agent_prompt
+        if cached and cached[0] == template and cached[1] is tools_schema:
+            return cached[2]
+        
+        tools_description = "\n".join([
+            f"- {t['name']}: {t['description']}" 
+            for t in tools_schema
+        ])
+        pieces = template.format(
+            tools_description=tools_description,
+            context=AGENT_CONTEXT_SLOT
+        ).split(AGENT_CONTEXT_SLOT)
+        self._agent_prompt = (template, tools_schema, pieces)
+        return pieces
     
     async def generate_with_tools(
         self, 
@@ -302,26 +646,21 @@ class AgenticGeminiClient(GeminiClient):
         
         tool_calls = []
         iteration = 0
-        accumulated_context = context
+        # Context grows by whole tool results; joined only when a prompt is built
+        ctx_chunks = [context] if context else []
         
-        # System prompt for agentic behavior
-        # System prompt for agentic behavior
-        system_prompt = self.prompt_manager.get_template("agent_system")
-        
-        tools_description = "\n".join([
-            f"- {t['name']}: {t['description']}" 
-            for t in tools_schema
-        ])
+        # System prompt for agentic behavior, pre-rendered around the context slot
+        system_pieces = self._agent_prompt_pieces(
+            self.prompt_manager.get_template("agent_system"), tools_schema
+        )
+        question_suffix = f"\n\nUser Question: {query}\n\nYour Response:"
         
         while iteration < self.max_tool_iterations:
             iteration += 1
             
             # Build prompt
-            prompt = system_prompt.format(
-                tools_description=tools_description,
-                context=accumulated_context or "No additional context available."
-            )
-            prompt += f"\n\nUser Question: {query}\n\nYour Response:"
+            accumulated_context = "".join(ctx_chunks) or "No additional context available."
+            prompt = accumulated_context.join(system_pieces) + question_suffix
             
             try:
                 response = await self.generate_content(prompt, temperature=0.2)
@@ -350,7 +689,7 @@ class AgenticGeminiClient(GeminiClient):
                     tool_calls.append(tool_call)
                     
                     # Add tool result to context for next iteration
-                    accumulated_context += f"\n\n[Tool: {tool_name}] Result:\n{result.data if result.success else result.error}"
+                    ctx_chunks.append(f"\n\n[Tool: {tool_name}] Result:\n{result.data if result.success else result.error}")
                     continue
             
             # Generate reasoning trace from tool calls
@@ -368,8 +707,14 @@ class AgenticGeminiClient(GeminiClient):
                 reasoning_trace=reasoning_trace
             )
         
-        if len(accumulated_context) > 20000:
-            accumulated_context = accumulated_context[-20000:] + "..."
+        # Only the last 20000 chars of context are kept; join just the chunks that cover them
+        tail, tail_len = [], 0
+        for chunk in reversed(ctx_chunks):
+            tail.append(chunk)
+            tail_len += len(chunk)
+            if tail_len >= 20000:
+                break
+        accumulated_context = "".join(reversed(tail))[-20000:]
 
         # Max iterations reached - generate summary
         trace_parts = [f"→ {tc.name}" for tc in tool_calls]
@@ -389,38 +734,19 @@ class AgenticGeminiClient(GeminiClient):
     
     def _is_tool_call(self, response: str) -> bool:
         """Check if the response is a tool call request."""
-        response = response.strip()
-        # Handle markdown blocks first
-        if "```" in response:
-             if "```json" in response:
-                 content = response.split("```json")[1].split("```")[0].strip()
-                 if content.startswith("{") and '"tool":' in content:
-                     return True
-             # Try generic code block
-             content = response.split("```")[1].split("```")[0].strip()
-             if content.startswith("{") and '"tool":' in content:
-                 return True
-
-        if response.startswith("{") and '"tool":' in response:
+        content = _tool_call_payload(response)
+        if content.startswith("{") and '"tool":' in content:
             return True
-        return False
+        response = response.strip()
+        return response.startswith("{") and '"tool":' in response
     
     def _parse_tool_call(self, response: str) -> Optional[Dict[str, Any]]:
         """Parse a tool call from the response."""
-        import json
         try:
-            # Clean up the response
-            response = response.strip()
-            # Handle markdown code blocks
-            if "```json" in response:
-                response = response.split("```json")[1].split("```")[0]
-            elif "```" in response:
-                response = response.split("```")[1].split("```")[0]
-            
-            data = json.loads(response)
-            if "tool" in data:
+            data = orjson.loads(_tool_call_payload(response))
+            if isinstance(data, dict) and "tool" in data:
                 return data
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             pass
         return None
 
@@ -7,11 +7,15 @@ and receive federated feedback.
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 from enum import Enum
 import uuid
 import json
+import sqlite3
+import time
+
+from core.db import iso_timestamp
 
 
 # =============================================================================
@@ -125,7 +129,6 @@ class KEPHandler:
     
     def _init_db(self):
         """Initialize SQLite database for KEP data."""
-        import sqlite3
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -155,14 +158,13 @@ class KEPHandler:
                 FOREIGN KEY(sender_agent_id) REFERENCES agents(agent_id)
             )
         """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_exchanges_ts ON exchanges(timestamp)")
         
         conn.commit()
         conn.close()
     
     def register_agent(self, agent: AgentInfo) -> bool:
         """Register an external agent."""
-        import sqlite3
-        import time
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
@@ -191,7 +193,6 @@ class KEPHandler:
     
     def get_agent(self, agent_id: str) -> Optional[AgentInfo]:
         """Get agent information by ID."""
-        import sqlite3
         
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
@@ -216,7 +217,6 @@ class KEPHandler:
     
     def list_agents(self) -> List[AgentInfo]:
         """List all registered agents."""
-        import sqlite3
         
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
@@ -249,7 +249,6 @@ class KEPHandler:
         4. Log the exchange
         5. Return KEPResponse
         """
-        import time
         start_time = time.time()
         
         try:
@@ -332,8 +331,6 @@ class KEPHandler:
     
     def _log_exchange(self, request: KEPRequest, answer: str, confidence: float):
         """Log a knowledge exchange to the database."""
-        import sqlite3
-        import time
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
@@ -357,8 +354,6 @@ class KEPHandler:
     
     def _update_agent_activity(self, agent_id: str):
         """Update the last_active timestamp for an agent."""
-        import sqlite3
-        import time
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
@@ -371,7 +366,6 @@ class KEPHandler:
     
     def get_exchange_history(self, agent_id: Optional[str] = None, limit: int = 50) -> List[Dict]:
         """Get history of knowledge exchanges."""
-        import sqlite3
         
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
@@ -398,10 +392,31 @@ class KEPHandler:
                 "domain": row["domain"],
                 "query": row["query"],
                 "confidence": row["confidence"],
-                "timestamp": datetime.fromtimestamp(row["timestamp"]).isoformat()
+                "timestamp": iso_timestamp(row["timestamp"])
             }
             for row in rows
         ]
+    
+    def get_recent_exchange_counts(self, window_seconds: float, limit: int = 100) -> Tuple[int, int]:
+        """
+        Count how many of the latest `limit` exchanges fall inside the window.
+        
+        Returns (recent, total), counted in SQL against the epoch timestamps.
+        """
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT COUNT(*), COALESCE(SUM(CASE WHEN timestamp > ? THEN 1 ELSE 0 END), 0)
+            FROM (SELECT timestamp FROM exchanges ORDER BY timestamp DESC LIMIT ?)
+            """,
+            (time.time() - window_seconds, limit)
+        )
+        total, recent = cursor.fetchone()
+        conn.close()
+        
+        return recent, total
 
 
 # =============================================================================
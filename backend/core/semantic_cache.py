@@ -0,0 +1,55 @@
+import time
+import numpy as np
+from typing import Optional, Sequence
+
+
+class SemanticAnswerCache:
+    """
+    Remembers recent (embedding, answer) pairs so near-identical inputs can be
+    answered without another LLM round trip.
+
+    Embeddings are expected to be unit-normalized (VectorProvider uses
+    normalize_embeddings=True), so cosine distance is 1 - dot product and a
+    lookup is a single matrix-vector product over the cache.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_distance: float = 0.05, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self._vectors: Optional[np.ndarray] = None  # allocated on first put, once the dimension is known
+        self._answers = [None] * max_entries
+        self._stored_at = np.zeros(max_entries, dtype=np.float64)
+        self._next = 0
+        self._size = 0
+
+    def get(self, embedding: Sequence[float]) -> Optional[str]:
+        """Return the cached answer for the closest fresh query, if close enough."""
+        if not self._size:
+            return None
+
+        similarities = self._vectors[:self._size] @ np.asarray(embedding, dtype=np.float32)
+        # Expired slots never match
+        similarities[self._stored_at[:self._size] < time.time() - self.ttl_seconds] = -1.0
+        best = int(np.argmax(similarities))
+        if 1.0 - similarities[best] < self.max_distance:
+            return self._answers[best]
+        return None
+
+    def put(self, embedding: Sequence[float], answer: str):
+        """Store an answer, overwriting the oldest slot once full."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+        slot = self._next
+        self._vectors[slot] = vector
+        self._answers[slot] = answer
+        self._stored_at[slot] = time.time()
+        self._next = (slot + 1) % self.max_entries
+        self._size = min(self._size + 1, self.max_entries)
+
+    def clear(self):
+        self._answers = [None] * self.max_entries
+        self._next = 0
+        self._size = 0
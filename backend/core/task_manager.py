@@ -1,8 +1,7 @@
-import uuid
 import time
 import asyncio
 from typing import Dict, Optional, List
-from core.a2a import Task, TaskState, TaskStatus, Message, Role, Part
+from core.a2a import Task, TaskState, TaskStatus, Message, Role, Part, next_uuid
 
 class TaskManager:
     def __init__(self):
@@ -10,7 +9,7 @@ class TaskManager:
         self._tasks: Dict[str, Task] = {}
 
     def create_task(self, context_id: Optional[str] = None) -> Task:
-        task_id = str(uuid.uuid4())
+        task_id = next_uuid()
         task = Task(
             id=task_id,
             contextId=context_id,
@@ -35,11 +34,13 @@ class TaskManager:
                 # Append to history as well? standard says status.message is implicit "newest"
                 # But let's keep history simple for now.
                 task.history.append(message)
+            task.touch()
     
     def add_message_to_task(self, task_id: str, message: Message):
         task = self._tasks.get(task_id)
         if task:
             task.history.append(message)
+            task.touch()
 
     def list_tasks(self, limit: int = 10) -> List[Task]:
         # Simple list implementation
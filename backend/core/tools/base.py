@@ -111,10 +111,12 @@ class ToolRegistry:
     
     def __init__(self):
         self._tools: Dict[str, Tool] = {}
+        self._gemini_schema: Optional[List[Dict[str, Any]]] = None
     
     def register(self, tool: Tool) -> None:
         """Register a new tool."""
         self._tools[tool.name] = tool
+        self._gemini_schema = None
     
     def get(self, name: str) -> Optional[Tool]:
         """Get a tool by name."""
@@ -128,8 +130,10 @@ class ToolRegistry:
         return tools
     
     def get_gemini_tools_schema(self) -> List[Dict[str, Any]]:
-        """Get all tools in Gemini Function Calling format."""
-        return [tool.to_gemini_schema() for tool in self._tools.values()]
+        """Get all tools in Gemini Function Calling format (built once per tool set)."""
+        if self._gemini_schema is None:
+            self._gemini_schema = [tool.to_gemini_schema() for tool in self._tools.values()]
+        return self._gemini_schema
     
     async def execute_tool(self, name: str, **kwargs) -> ToolResult:
         """Execute a tool by name."""
@@ -24,7 +24,7 @@ async def ask_peer_agent(query: str, domain: str, **kwargs) -> Dict[str, Any]:
     peer_url = peer_urls.get(domain, "http://localhost:8001")
     
     try:
-        client = A2AClient(agent_url=peer_url)
+        client = A2AClient.get(peer_url)
         answer = await client.ask_and_wait(query)
         
         return {
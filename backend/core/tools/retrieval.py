@@ -1,6 +1,6 @@
 from typing import Dict, Any, Optional
 from core.tools.base import register_tool, ToolCategory, ToolParameter
-from core.config import current_settings
+from core.config import get_settings
 
 # Module-level cached providers
 _vector_provider = None
@@ -36,9 +36,11 @@ def get_graph_provider():
 async def search_vector(query: str, num_results: int = None, **kwargs) -> Dict[str, Any]:
     """Search documents using vector similarity."""
     
+    settings = get_settings()
+    
     # Use global default if not provided
     if num_results is None:
-        num_results = current_settings.top_k
+        num_results = settings.top_k
     
     # Handle aliases from LLM hallucinations
     if 'top_k' in kwargs:
@@ -53,8 +55,8 @@ async def search_vector(query: str, num_results: int = None, **kwargs) -> Dict[s
         # Truncate content for token efficiency
         for doc in results:
             if "content" in doc and isinstance(doc["content"], str):
-                 if len(doc["content"]) > current_settings.chunk_size:
-                     doc["content"] = doc["content"][:current_settings.chunk_size] + "...(truncated)"
+                 if len(doc["content"]) > settings.chunk_size:
+                     doc["content"] = doc["content"][:settings.chunk_size] + "...(truncated)"
                      
         return {
             "documents": results,
@@ -77,7 +79,7 @@ async def search_graph(query: str, depth: int = None, **kwargs) -> Dict[str, Any
     """Search graph for entities and relationships."""
     
     if depth is None:
-        depth = current_settings.graph_depth
+        depth = get_settings().graph_depth
     try:
         provider = get_graph_provider()
         # GraphProvider.get_graph_data returns nodes/edges. 
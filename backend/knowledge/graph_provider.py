@@ -1,3 +1,4 @@
+import asyncio
 from typing import List, Dict, Any
 from falkordb import FalkorDB
 from core.gemini_client import GeminiClient
@@ -96,7 +97,7 @@ class GraphProvider(KnowledgeProvider):
         """
         
         try:
-            result = self.graph.query(cypher)
+            result = await asyncio.to_thread(self.graph.query, cypher)
             
             # Process results for both LLM (text) and UI (graph viz)
             text_results = []
@@ -144,14 +145,14 @@ class GraphProvider(KnowledgeProvider):
         Returns statistics about the knowledge graph.
         """
         try:
-            # Count Nodes
+            # Count nodes and edges off the event loop
             node_query = "MATCH (n) RETURN count(n) as count"
-            node_result = self.graph.query(node_query)
-            node_count = node_result.result_set[0][0] if node_result.result_set else 0
-            
-            # Count Edges
             edge_query = "MATCH ()-[r]->() RETURN count(r) as count"
-            edge_result = self.graph.query(edge_query)
+            node_result, edge_result = await asyncio.gather(
+                asyncio.to_thread(self.graph.query, node_query),
+                asyncio.to_thread(self.graph.query, edge_query)
+            )
+            node_count = node_result.result_set[0][0] if node_result.result_set else 0
             edge_count = edge_result.result_set[0][0] if edge_result.result_set else 0
             
             return {
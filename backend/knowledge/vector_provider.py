@@ -1,51 +1,130 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 import chromadb
 from chromadb.utils import embedding_functions
 from .provider import KnowledgeProvider
 import uuid
-from core.config import current_settings
+import asyncio
+import heapq
+import zlib
+import os
+from urllib.parse import urlparse
+from core.config import get_settings
 
 class VectorProvider(KnowledgeProvider):
-    def __init__(self, collection_name: str = "dkmes_docs", persist_directory: str = "./data/chroma"):
-        self.client = chromadb.PersistentClient(path=persist_directory)
+    def __init__(self, collection_name: str = "dkmes_docs", persist_directory: str = "./data/chroma", num_shards: int = 1):
+        # Share one Chroma server between agents when CHROMA_URL is set (e.g. http://127.0.0.1:8100),
+        # otherwise keep a local persistent store per agent
+        chroma_url = os.getenv("CHROMA_URL")
+        if chroma_url:
+            parsed = urlparse(chroma_url)
+            self.client = chromadb.HttpClient(
+                host=parsed.hostname or "localhost",
+                port=parsed.port or 8000,
+                ssl=parsed.scheme == "https"
+            )
+        else:
+            self.client = chromadb.PersistentClient(path=persist_directory)
+        self.collection_name = collection_name
         
-        # Use a default embedding function (all-MiniLM-L6-v2 is standard and fast)
-        self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+        # Use a default embedding function (all-MiniLM-L6-v2 is standard and fast).
+        # Vectors are L2-normalized, so inner product equals cosine similarity.
+        self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
+            model_name="all-MiniLM-L6-v2",
+            normalize_embeddings=True
+        )
         
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name,
-            embedding_function=self.embedding_fn
+        # Large corpora can be split over several collections so each HNSW index stays small.
+        # With a single shard the collection keeps its plain name.
+        self.num_shards = max(1, num_shards)
+        self.shards = [self._open_shard(name) for name in self._shard_names()]
+        self.collection = self.shards[0]
+
+    def _shard_names(self) -> List[str]:
+        if self.num_shards == 1:
+            return [self.collection_name]
+        return [f"{self.collection_name}_{i}" for i in range(self.num_shards)]
+
+    def _open_shard(self, name: str):
+        # Only applies to new collections; existing ones keep the space they were created with
+        return self.client.get_or_create_collection(
+            name=name,
+            embedding_function=self.embedding_fn,
+            metadata={"hnsw:space": "ip"}
         )
 
+    def _shard_index(self, key: str) -> int:
+        # crc32 is stable across processes, unlike hash()
+        return zlib.crc32(key.encode("utf-8")) % self.num_shards
+
+    def _group_by_shard(self, chunks: List[str]) -> Dict[int, List[str]]:
+        """Chunks grouped by the shard they are routed to (keyed on the chunk text)."""
+        groups: Dict[int, List[str]] = {}
+        for chunk in chunks:
+            groups.setdefault(self._shard_index(chunk), []).append(chunk)
+        return groups
+
+    async def warmup(self):
+        """
+        Resolves the collection and loads the embedding model up front,
+        so the first ingest or search doesn't pay for it.
+        """
+        for shard in self.shards:
+            shard.count()
+        self.embedding_fn(["warmup"])
+
     async def ingest(self, text: str) -> bool:
         """
         Ingests text into ChromaDB.
         Splits text into chunks (simple splitting for now) and stores them.
         """
         try:
-            # Chunking logic using current_settings
+            # Chunking logic using the current SystemSettings
             chunks = self._chunk_text(text) 
             
-            ids = [str(uuid.uuid4()) for _ in chunks]
-            metadatas = [{"source": "user_input"} for _ in chunks]
-            
-            self.collection.add(
-                documents=chunks,
-                metadatas=metadatas,
-                ids=ids
-            )
+            # Each chunk goes to its own shard, same routing as add_chunks
+            for i, shard_chunks in self._group_by_shard(chunks).items():
+                self.shards[i].add(
+                    documents=shard_chunks,
+                    metadatas=[{"source": "user_input"} for _ in shard_chunks],
+                    ids=[str(uuid.uuid4()) for _ in shard_chunks]
+                )
             print(f"Ingested {len(chunks)} chunks into Vector DB.")
             return True
         except Exception as e:
             print(f"Error ingesting into Vector DB: {e}")
             return False
 
+    def embed_chunks(self, chunks: List[str]) -> List[Any]:
+        """
+        Embeds a batch of chunks with a single embedding model call.
+        """
+        return self.embedding_fn(chunks)
+
+    def add_chunks(self, chunks: List[str], embeddings: List[Any]):
+        """
+        Stores already embedded chunks in the collection.
+        """
+        groups: Dict[int, tuple] = {}
+        for chunk, embedding in zip(chunks, embeddings):
+            shard_chunks, shard_embeddings = groups.setdefault(self._shard_index(chunk), ([], []))
+            shard_chunks.append(chunk)
+            shard_embeddings.append(embedding)
+        
+        for i, (shard_chunks, shard_embeddings) in groups.items():
+            self.shards[i].add(
+                documents=shard_chunks,
+                embeddings=shard_embeddings,
+                metadatas=[{"source": "user_input"} for _ in shard_chunks],
+                ids=[str(uuid.uuid4()) for _ in shard_chunks]
+            )
+
     def _chunk_text(self, text: str) -> List[str]:
         """
         Splits text into chunks based on SystemSettings.
         """
-        chunk_size = current_settings.chunk_size
-        chunk_overlap = current_settings.chunk_overlap
+        settings = get_settings()
+        chunk_size = settings.chunk_size
+        chunk_overlap = settings.chunk_overlap
         
         if not text:
             return []
@@ -73,33 +152,79 @@ class VectorProvider(KnowledgeProvider):
             
         return chunks
 
-    async def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def _chunk_bytes(self, data, chunk_size: int = None, chunk_overlap: int = None) -> Iterator[str]:
+        """
+        Splits UTF-8 bytes (e.g. an mmap) like _chunk_text, one decoded window at a time.
+        Window sizes default to SystemSettings but are measured in bytes, not characters,
+        so non-ASCII text gets fewer characters per chunk (about a third for Korean).
+        """
+        settings = get_settings()
+        chunk_size = chunk_size or settings.chunk_size
+        chunk_overlap = settings.chunk_overlap if chunk_overlap is None else chunk_overlap
+        
+        start = 0
+        data_len = len(data)
+        
+        while start < data_len:
+            end = min(start + chunk_size, data_len)
+            
+            if end < data_len:
+                last_space = data.rfind(b' ', start, end)
+                if last_space != -1 and (end - last_space) < 100:
+                    end = last_space
+                else:
+                    # Don't split a multi-byte character
+                    while end > start + 1 and (data[end] & 0xC0) == 0x80:
+                        end -= 1
+            
+            chunk = data[start:end].decode("utf-8", "replace").strip()
+            if chunk:
+                yield chunk
+            
+            start = max(start + 1, end - chunk_overlap)
+            # Overlap may land inside a multi-byte character too
+            while start < data_len and (data[start] & 0xC0) == 0x80:
+                start += 1
+
+    async def embed_query(self, query: str) -> List[Any]:
+        """Embeds a single query off the event loop; the result can be passed to search()."""
+        return await asyncio.to_thread(self.embedding_fn, [query])
+
+    async def search(self, query: str, top_k: int = 5, query_embeddings: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
         """
         Performs semantic search using vector embeddings.
         """
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=top_k
-        )
+        # Chroma calls block (embedding + HNSW lookup), keep them off the event loop.
+        # The query is embedded once and shared by every shard.
+        if query_embeddings is None:
+            query_embeddings = await self.embed_query(query)
+        shard_results = await asyncio.gather(*[
+            asyncio.to_thread(shard.query, query_embeddings=query_embeddings, n_results=top_k)
+            for shard in self.shards
+        ])
         
         # Format results to match the expected output
         formatted_results = []
-        if results['documents']:
-            for i, doc in enumerate(results['documents'][0]):
-                formatted_results.append({
-                    "content": doc,
-                    "metadata": results['metadatas'][0][i] if results['metadatas'] else {},
-                    "score": results['distances'][0][i] if results['distances'] else 0.0
-                })
+        for results in shard_results:
+            if results['documents']:
+                for i, doc in enumerate(results['documents'][0]):
+                    formatted_results.append({
+                        "content": doc,
+                        "metadata": results['metadatas'][0][i] if results['metadatas'] else {},
+                        "score": results['distances'][0][i] if results['distances'] else 0.0
+                    })
         
-        return formatted_results
+        if self.num_shards == 1:
+            return formatted_results
+        # Lower distance = better match
+        return heapq.nsmallest(top_k, formatted_results, key=lambda r: r["score"])
 
     async def get_stats(self) -> Dict[str, int]:
         """
         Returns statistics about the vector collection.
         """
-        count = self.collection.count()
-        return {"vector_chunks": count}
+        counts = await asyncio.gather(*(asyncio.to_thread(shard.count) for shard in self.shards))
+        return {"vector_chunks": sum(counts)}
 
     async def clear(self) -> bool:
         """
@@ -107,11 +232,10 @@ class VectorProvider(KnowledgeProvider):
         """
         try:
             # Delete and recreate
-            self.client.delete_collection(self.collection.name)
-            self.collection = self.client.get_or_create_collection(
-                name=self.collection.name,
-                embedding_function=self.embedding_fn
-            )
+            for shard in self.shards:
+                self.client.delete_collection(shard.name)
+            self.shards = [self._open_shard(name) for name in self._shard_names()]
+            self.collection = self.shards[0]
             return True
         except Exception as e:
             print(f"Error clearing Vector DB: {e}")
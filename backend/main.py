@@ -1,20 +1,30 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
+import asyncio
 import json
+import logging
+import logging.handlers
+import multiprocessing
 import os
+import queue
 import time
 from dotenv import load_dotenv
 import io
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 
 # Text Extraction Libraries
 from pypdf import PdfReader
 from docx import Document
 from bs4 import BeautifulSoup
 
-from core.gemini_client import GeminiClient
+from core.gemini_client import AgenticGeminiClient
 from knowledge.graph_provider import GraphProvider
 from knowledge.vector_provider import VectorProvider
+from core.a2a_client import close_shared_http_client
+from core.answer_cache import answer_cache
 
 # Load .env.local from the backend directory
 env_path = os.path.join(os.path.dirname(__file__), ".env.local")
@@ -24,11 +34,41 @@ if os.path.exists(env_path):
 else:
     print(f"Warning: .env.local not found at {env_path}")
 
+# Records go through a queue to a listener thread, so logging never blocks the event loop
+_log_queue = queue.SimpleQueue()
+_log_stream = logging.StreamHandler()
+_log_stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+log_listener = logging.handlers.QueueListener(_log_queue, _log_stream)
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
+)
+log_listener.start()
+logger = logging.getLogger(__name__)
+
 from fastapi.middleware.cors import CORSMiddleware
 
 from api import documents, a2a, settings, prompts
 
-app = FastAPI(title="DKMES API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Worker processes for CPU-bound PDF text extraction. Not forked from this
+    # process, which already runs threads (log listener, to_thread workers);
+    # forkserver also avoids re-importing this module in every worker
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    app.state.pdf_pool = ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        mp_context=multiprocessing.get_context(start_method)
+    )
+    yield
+    # Release pooled resources on shutdown
+    await gemini_client.flush_cache()
+    await close_shared_http_client()
+    app.state.pdf_pool.shutdown(wait=False, cancel_futures=True)
+    log_listener.stop()
+
+
+app = FastAPI(title="DKMES API", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # CORS Middleware
 app.add_middleware(
@@ -48,11 +88,14 @@ app.include_router(a2a.router)  # No prefix for /a2a as per A2A spec
 
 # Initialize Clients
 PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT", "your-project-id")
-gemini_client = GeminiClient(project_id=PROJECT_ID)
+# Agentic client is a drop-in GeminiClient, so one instance serves RAG and tool calling
+gemini_client = AgenticGeminiClient(project_id=PROJECT_ID)
 
 # Initialize Knowledge Providers
 graph_provider = GraphProvider(host="localhost", port=6379, gemini_client=gemini_client)
 vector_provider = VectorProvider(persist_directory="./data/chroma")
+# Share the embedding model with the LLM client's semantic response cache
+gemini_client.embedding_fn = vector_provider.embedding_fn
 
 # Store in app.state for access in routers
 app.state.gemini_client = gemini_client
@@ -133,7 +176,7 @@ def health_check():
         "port": 8000
     }
 
-from core.a2a import dkmes_agent_card, A2AHandler, JsonRpcRequest, JsonRpcResponse, Task, TaskStatus, TaskState, Message, Role, Part, A2A_ERRORS
+from core.a2a import dkmes_agent_card, _AGENT_CARD_JSON, A2AHandler, JsonRpcRequest, JsonRpcResponse, Task, TaskStatus, TaskState, Message, Role, Part, A2A_ERRORS
 import uuid as uuid_lib
 import time as time_lib
 
@@ -142,7 +185,7 @@ def get_agent_card():
     """
     Returns the A2A Agent Card for discovery.
     """
-    return dkmes_agent_card.model_dump()
+    return Response(content=_AGENT_CARD_JSON, media_type="application/json")
 
 
 @app.post("/a2a")
@@ -220,9 +263,10 @@ async def handle_a2a_request(request: dict):
             return JsonRpcResponse(id=rpc_request.id, result=task.model_dump()).model_dump()
             
         except Exception as e:
-            print(f"[A2A] Error processing message: {e}")
-            import traceback
-            traceback.print_exc()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.exception("[A2A] Error processing message")
+            else:
+                logger.warning("[A2A] Error processing message: %s", e)
             
             # Return error task
             task = Task(
@@ -285,23 +329,17 @@ async def evaluate_agent(request: EvaluationRequest):
                 context_str = "\n".join(context)
                 system_answer = await gemini_client.generate_answer(request.query, context_str)
                 
-                # 2. Main LLM Judge (Overall Score)
-                judge_response_str = await gemini_client.evaluate_rag_context(request.query, context, request.persona)
+                # 2. Main LLM Judge (Overall Score) and 3. Advanced Metrics, concurrently
+                # RAGAS (LLM-based). Context Recall needs Ground Truth, which we don't have
+                # in this live eval mode, so calculate_all_metrics skips it.
+                judge_response_str, metrics = await asyncio.gather(
+                    gemini_client.evaluate_rag_context(request.query, context, request.persona),
+                    gemini_client.calculate_all_metrics(request.query, system_answer, context)
+                )
                 judge_response_str = judge_response_str.replace("```json", "").replace("```", "").strip()
                 judge_result = json.loads(judge_response_str)
                 
-                # 3. Calculate Advanced Metrics
-                # RAGAS (LLM-based)
-                faithfulness = await gemini_client.calculate_faithfulness(request.query, system_answer, context)
-                relevance = await gemini_client.calculate_answer_relevance(request.query, system_answer)
-                # Context Recall needs Ground Truth, which we don't have in this live eval mode, so we skip or mock it.
-                # For now, let's assume no ground truth available in live mode.
-                
-                metrics = {
-                    "faithfulness": faithfulness,
-                    "answer_relevance": relevance,
-                    "rouge_l": 0.0 # No ground truth in live eval
-                }
+                metrics["rouge_l"] = 0.0  # No ground truth in live eval
                 
                 tracer.log_step(trace_id, f"LLM Judge End ({strategy_name})", "Gemini Response", judge_result)
                 
@@ -460,6 +498,7 @@ class NodeUpdate(BaseModel):
 @app.put("/api/v1/graph/nodes/{node_id}")
 async def update_node(node_id: str, update: NodeUpdate):
     success = await graph_provider.update_node(node_id, update.properties)
+    answer_cache.clear()
     if not success:
         raise HTTPException(status_code=500, detail="Failed to update node")
     return {"status": "success"}
@@ -467,6 +506,7 @@ async def update_node(node_id: str, update: NodeUpdate):
 @app.delete("/api/v1/graph/nodes/{node_id}")
 async def delete_node(node_id: str):
     success = await graph_provider.delete_node(node_id)
+    answer_cache.clear()
     if not success:
         raise HTTPException(status_code=500, detail="Failed to delete node")
     return {"status": "success"}
@@ -542,7 +582,8 @@ async def get_system_stats():
             "status": "online",
             "vector_chunks": vector_stats.get("vector_chunks", 0),
             "graph_nodes": graph_stats.get("graph_nodes", 0),
-            "graph_edges": graph_stats.get("graph_edges", 0)
+            "graph_edges": graph_stats.get("graph_edges", 0),
+            "llm_cache": gemini_client.cache_stats
         }
     except Exception as e:
         print(f"Error getting system stats: {e}")
@@ -585,10 +626,10 @@ async def get_activity_stats(days: int = 7):
 # Phase 11: Agentic AI Endpoints
 # ============================================================================
 
-from core.gemini_client import AgenticGeminiClient, AgentResponse, ToolCall
+from core.gemini_client import AgentResponse, ToolCall
 
-# Initialize Agentic Client
-agentic_client = AgenticGeminiClient(project_id=PROJECT_ID)
+# Shares the app-wide client created at startup
+agentic_client = gemini_client
 
 
 class AgentChatRequest(BaseModel):
@@ -1078,8 +1119,12 @@ async def receive_feedback(feedback: KEPFeedback):
     This webhook is called by external agents when their end-users
     provide feedback about knowledge received from DKMES.
     """
+    # Only queues the row; the store's flusher writes it in the next batch
     store = get_feedback_store()
-    feedback_id = store.store_feedback(feedback)
+    try:
+        feedback_id = store.store_feedback(feedback)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     
     return {
         "status": "success",
@@ -1182,14 +1227,14 @@ async def run_assessment(domain: Optional[str] = None):
 @app.get("/api/v1/assessment/history")
 async def get_assessment_history(limit: int = 20):
     """Get history of past self-assessments."""
-    history = assessment_engine.get_assessment_history(limit=limit)
+    history = list(assessment_engine.get_assessment_history(limit=limit))
     return {"assessments": history}
 
 
 @app.get("/api/v1/assessment/trend")
 async def get_assessment_trend(days: int = 30):
     """Get score trend over time."""
-    trend = assessment_engine.get_score_trend(days=days)
+    trend = list(assessment_engine.get_score_trend(days=days))
     return {"trend": trend, "period_days": days}
 
 